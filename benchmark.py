@@ -0,0 +1,119 @@
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+from os.path import join
+
+from src.journal import TradeJournal
+from src.scribe import Scribe
+
+
+def make_report(i):
+    return {
+        'id': i,
+        'date': '2018-10-26 19:36:54',
+        'symbol': 'T{0}/BTC'.format(i),
+        'exchange': 'Binance',
+        'signal_price': 0.0001,
+        'estimated_profit': 10.0,
+        'buy_price': None,
+        'sell_price': None,
+        'work_time_secs': 0,
+        'order_open_time': 0,
+        'placed_buy_order': False,
+        'bought': False
+    }
+
+
+def dump_key(report):
+    return report['date'][:-9] + '_' + report['symbol'][:-4] + '_' + report['exchange']
+
+
+def bench_journal(trades=500, steps=60):
+    directory = tempfile.mkdtemp()
+    try:
+        reports = [make_report(i) for i in range(trades)]
+        dumps = join(directory, 'dumps')
+        os.makedirs(dumps)
+        start = time.time()
+        for step in range(steps):
+            for report in reports:
+                report['work_time_secs'] = step
+                with open(join(dumps, dump_key(report)), 'w+') as file:
+                    json.dump(report, file)
+        dumps_write = time.time() - start
+        start = time.time()
+        restored = []
+        for filename in os.listdir(dumps):
+            with open(join(dumps, filename), 'r') as file:
+                restored.append(json.load(file))
+        dumps_restore = time.time() - start
+        dumps_bytes = sum(os.path.getsize(join(dumps, f)) for f in os.listdir(dumps)) * steps
+
+        reports = [make_report(i) for i in range(trades)]
+        journal_filename = join(directory, 'journal')
+        journal = TradeJournal(journal_filename)
+        start = time.time()
+        for step in range(steps):
+            for report in reports:
+                report['work_time_secs'] = step
+                journal.record(dump_key(report), report)
+        journal.close()
+        journal_write = time.time() - start
+        journal_bytes = os.path.getsize(journal_filename)
+        start = time.time()
+        restored = TradeJournal(journal_filename).get_states()
+        journal_restore = time.time() - start
+
+        print('journal benchmark: {0} trades x {1} steps'.format(trades, steps))
+        print('    - json dumps: write {0:.3f}s, restore {1:.3f}s, ~{2} bytes written'.format(
+            dumps_write, dumps_restore, dumps_bytes))
+        print('    - journal: write {0:.3f}s, restore {1:.3f}s ({2} trades), {3} bytes on disk'.format(
+            journal_write, journal_restore, len(restored), journal_bytes))
+    finally:
+        shutil.rmtree(directory)
+
+
+def bench_scribe(rows=1000000, count_of_signals=3, repeats=5):
+    directory = tempfile.mkdtemp()
+    try:
+        filename = join(directory, 'trades.csv')
+        report = make_report(0)
+        with open(filename, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=report.keys())
+            writer.writeheader()
+            for i in range(rows):
+                report['id'] = i
+                writer.writerow(report)
+
+        start = time.time()
+        for _ in range(repeats):
+            with open(filename, 'r', newline='') as file:
+                full = list(csv.DictReader(file))[-count_of_signals:]
+        full_read = (time.time() - start) / repeats
+        start = time.time()
+        for _ in range(repeats):
+            tail = Scribe.read_from_csv(filename, count_of_signals)
+        tail_read = (time.time() - start) / repeats
+        assert full == tail
+
+        print('scribe benchmark: last {0} of {1} rows, {2} bytes'.format(
+            count_of_signals, rows, os.path.getsize(filename)))
+        print('    - full parse: {0:.3f}s'.format(full_read))
+        print('    - tail seek: {0:.6f}s'.format(tail_read))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    benchmarks = {
+        'journal': bench_journal,
+        'scribe': bench_scribe
+    }
+    names = sys.argv[1:] if len(sys.argv) > 1 else list(benchmarks)
+    for name in names:
+        benchmarks[name]()
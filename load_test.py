@@ -0,0 +1,113 @@
+import sys
+import time
+import shutil
+import tempfile
+
+from os.path import join
+from datetime import datetime, timedelta
+
+from src import Trader, SimulatedExchange
+from src.constants import allowed_exchanges, exchanges_fees
+
+
+class LoadTestBot:
+    def __init__(self):
+        self.messages = 0
+
+    def send(self, tokens):
+        self.messages += 1
+
+
+class LoadTestScribe:
+    def __init__(self):
+        self.trades = []
+
+    def trade(self, report):
+        self.trades.append((time.time(), dict(report)))
+
+
+def percentile(values, per):
+    if len(values) == 0:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * per / 100.0), len(values) - 1)]
+
+
+def run(trades=1000, exchanges=3, error_rate=0.01, rate_limit=5, fill_latency=1.0, timeout=600):
+    directory = tempfile.mkdtemp()
+    try:
+        names = [ex for ex in allowed_exchanges if ex in exchanges_fees][:exchanges]
+        # one symbol per trade, a trade sells its whole free token balance
+        clients = {}
+        for i, name in enumerate(names):
+            symbols = ['T{0}/BTC'.format(j) for j in range(i, trades, len(names))]
+            clients[name] = SimulatedExchange(
+                symbols,
+                rate_limit=rate_limit,
+                fill_latency=fill_latency,
+                error_rate=error_rate,
+                seed=i)
+        trader = Trader(clients, join(directory, 'journal'), join(directory, 'markets'))
+        bot = LoadTestBot()
+        scribe = LoadTestScribe()
+        trader.set_pool({'bot': bot, 'scribe': scribe, 'trader': trader})
+
+        start = time.time()
+        first_date = datetime(2018, 1, 1)
+        for i in range(trades):
+            exchange = names[i % len(names)]
+            symbol = 'T{0}/BTC'.format(i)
+            trader.make_trade({
+                'id': i,
+                'date': str(first_date + timedelta(days=i)),
+                'ticker': symbol[:-4],
+                'exchange': exchange,
+                'price_btc': clients[exchange].price(symbol),
+                'bpi': 6000.0,
+                'estimated_profit': 1.0
+            }, received=time.time())
+        submitted = time.time() - start
+
+        while time.time() - start < timeout:
+            alive = trader.registry.count_active()
+            if alive == 0:
+                break
+            time.sleep(1)
+        elapsed = time.time() - start
+
+        reports = [report for _, report in scribe.trades]
+        sold = [report for report in reports if report['sold']]
+        durations = [finished - start for finished, _ in scribe.trades]
+        times_to_order = [report['time_to_order_secs'] for report in reports
+                          if report.get('time_to_order_secs') is not None]
+        attempts = [report.get('order_attempts', 0) for report in reports]
+        slippages = [report['expected_slippage'] for report in reports if report.get('expected_slippage') is not None]
+        calls = sum(client.get_calls() for client in clients.values())
+        reasons = {}
+        for report in reports:
+            if report['cancel_reason'] is not None:
+                reasons[report['cancel_reason']] = reasons.get(report['cancel_reason'], 0) + 1
+
+        print('load test: {0} trades on {1}'.format(trades, ', '.join(names)))
+        print('    - submitted in {0:.2f}s, finished {1} ({2} sold) in {3:.2f}s'.format(
+            submitted, len(reports), len(sold), elapsed))
+        print('    - throughput: {0:.2f} trades/s'.format(len(reports) / elapsed))
+        print('    - api calls: {0} total, {1:.2f} per trade'.format(calls, calls / max(len(reports), 1)))
+        for name, client in clients.items():
+            stats = trader.limiters[name].get_stats()
+            print('        * {0}: {1} calls, {2} throttled, {3} injected errors, {4:.3f}s avg queue'.format(
+                name, client.get_calls(), client.throttled, client.injected_errors, stats['avg_queue_secs']))
+        print('    - time to order: p50 {0:.2f}s, p95 {1:.2f}s, max {2:.2f}s'.format(
+            percentile(times_to_order, 50), percentile(times_to_order, 95), percentile(times_to_order, 100)))
+        print('    - trade duration: p50 {0:.2f}s, p95 {1:.2f}s, max {2:.2f}s'.format(
+            percentile(durations, 50), percentile(durations, 95), percentile(durations, 100)))
+        print('    - order attempts per trade: {0:.2f}, expected slippage p50 {1:.4f}%, max {2:.4f}%'.format(
+            sum(attempts) / max(len(attempts), 1), percentile(slippages, 50), percentile(slippages, 100)))
+        for reason, count in reasons.items():
+            print('    - cancelled ({0}): {1}'.format(reason, count))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run(*[int(arg) for arg in sys.argv[1:3]])
@@ -1,7 +1,10 @@
 from .bot import Bot
 from .client import Client
 from .collector import Collector
+from .jobs import JobManager
+from .memory import MemoryMonitor
 from .predictor import Predictor, PredictorLearnThread
+from .profiler import Profiler
 from .scribe import Scribe
-from .trader import Trader, TraderThreadCleaner
-from .util import GarbageCleanerThread
+from .simulator import SimulatedExchange
+from .trader import Trader
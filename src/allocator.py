@@ -0,0 +1,39 @@
+from threading import Lock
+
+
+class CapitalAllocator:
+    def __init__(self, slots, budget):
+        self.lock = Lock()
+        self.slots = slots
+        self.budget = budget
+        self.reservations = {}
+        self.used_budget = 0.0
+
+    def admit(self, key, amount, force=False):
+        with self.lock:
+            if key in self.reservations:
+                # only a forced admit may repeat, it follows the approval or restores a trade
+                return None if force else 'already trading this ticker'
+            if not force:
+                if len(self.reservations) >= self.slots:
+                    return 'no free trade slots on exchange'
+                if self.used_budget + amount > self.budget:
+                    return 'exchange trade budget exhausted'
+            self.reservations[key] = amount
+            self.used_budget += amount
+            return None
+
+    def release(self, key):
+        with self.lock:
+            amount = self.reservations.pop(key, None)
+            if amount is not None:
+                self.used_budget -= amount
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'used_slots': len(self.reservations),
+                'slots': self.slots,
+                'used_budget': self.used_budget,
+                'budget': self.budget
+            }
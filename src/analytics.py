@@ -0,0 +1,182 @@
+import io
+import os
+import csv
+import datetime
+
+from threading import Lock
+
+from .constants import scribe_finished_trades, scribe_approved_signals, scribe_ignored_signals, \
+    analytics_numeric_cols, analytics_report_rows
+
+
+class ScribeTable:
+    def __init__(self, filename):
+        self.filename = filename
+        self.header = None
+        self.offset = 0
+        self.columns = {}
+        self.rows = 0
+
+    def reset(self, header):
+        self.header = header
+        self.columns = {}
+        self.rows = 0
+        if header is not None:
+            for name in next(csv.reader(io.StringIO(header.decode(), newline='')), []):
+                self.columns[name] = []
+
+    def refresh(self):
+        if not os.path.isfile(self.filename):
+            self.reset(None)
+            self.offset = 0
+            return
+        with open(self.filename, 'rb') as file:
+            header = file.readline()
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            # the writer rewrites the whole file when the header widens
+            if header != self.header or size < self.offset:
+                self.reset(header)
+                self.offset = len(header)
+            file.seek(self.offset)
+            chunk = file.read(size - self.offset)
+        chunk = chunk[:chunk.rfind(b'\n') + 1]
+        if len(chunk) == 0:
+            return
+        self.offset += len(chunk)
+        for row in csv.reader(io.StringIO(chunk.decode(), newline='')):
+            for name, value in zip(self.columns, row + [''] * (len(self.columns) - len(row))):
+                if value == '':
+                    value = None
+                elif name in analytics_numeric_cols:
+                    value = float(value)
+                self.columns[name].append(value)
+            self.rows += 1
+
+    def column(self, name):
+        return self.columns.get(name, [None] * self.rows)
+
+
+class Analytics:
+    def __init__(self):
+        self.lock = Lock()
+        self.trades = ScribeTable(scribe_finished_trades)
+        self.approved = ScribeTable(scribe_approved_signals)
+        self.ignored = ScribeTable(scribe_ignored_signals)
+
+    def refresh(self):
+        for table in [self.trades, self.approved, self.ignored]:
+            table.refresh()
+
+    @staticmethod
+    def week(date):
+        year, week, _ = datetime.datetime.strptime(date[:10], '%Y-%m-%d').isocalendar()
+        return '{0}-W{1:02d}'.format(year, week)
+
+    @staticmethod
+    def breakdown(values):
+        counts = {}
+        for value in values:
+            if value is not None:
+                counts[value] = counts.get(value, 0) + 1
+        return sorted(counts.items(), key=lambda item: -item[1])
+
+    def estimated_profits(self):
+        # the trade report lowers its estimate by the price increase before buying, the signal keeps the prediction
+        predicted = dict(zip(self.approved.column('id'), self.approved.column('estimated_profit')))
+        return [predicted.get(signal_id, estimated) for signal_id, estimated in
+                zip(self.trades.column('id'), self.trades.column('estimated_profit'))]
+
+    def group_profits(self, by):
+        if by == 'exchange':
+            keys = self.trades.column('exchange')
+        elif by == 'ticker':
+            keys = [symbol[:-4] if symbol is not None else None for symbol in self.trades.column('symbol')]
+        elif by == 'week':
+            keys = [self.week(date) if date is not None else None for date in self.trades.column('date')]
+        else:
+            raise ValueError('unknown grouping: ' + str(by))
+        groups = {}
+        for key, real, estimated, amount in zip(
+                keys,
+                self.trades.column('real_profit'),
+                self.estimated_profits(),
+                self.trades.column('trade_amount_per_thread')):
+            if key is None or real is None:
+                continue
+            group = groups.setdefault(key, {'trades': 0, 'wins': 0, 'real': 0.0, 'estimated': 0.0, 'dollars': 0.0})
+            group['trades'] += 1
+            group['wins'] += 1 if real > 0 else 0
+            group['real'] += real
+            group['estimated'] += estimated or 0.0
+            group['dollars'] += (amount or 0.0) * real / 100
+        return groups
+
+    def get_profit_report(self, by='exchange'):
+        with self.lock:
+            self.refresh()
+            groups = self.group_profits(by)
+        report = '    - Realized vs estimated profit by {0}:\n'.format(by)
+        if len(groups) == 0:
+            report += '        * None\n'
+            return report
+        rows = sorted(groups.items(), key=lambda item: -item[1]['trades'])
+        for key, group in rows[:analytics_report_rows]:
+            report += '        * {0}: {1} trades, {2:.0f}% wins, {3:.2f}% real vs {4:.2f}% estimated, ' \
+                      '{5:.2f}$\n'.format(
+                key,
+                group['trades'],
+                group['wins'] / group['trades'] * 100,
+                group['real'] / group['trades'],
+                group['estimated'] / group['trades'],
+                group['dollars'])
+        if len(rows) > analytics_report_rows:
+            report += '        * ... and {0} more\n'.format(len(rows) - analytics_report_rows)
+        return report
+
+    def get_report(self):
+        with self.lock:
+            self.refresh()
+            approved = self.approved.rows
+            ignored = self.ignored.rows
+            ignore_reasons = self.breakdown(self.ignored.column('ignore_reason'))
+            cancel_reasons = self.breakdown(self.trades.column('cancel_reason'))
+            sell_reasons = self.breakdown(self.trades.column('sell_reason'))
+            real_profits = [v for v in self.trades.column('real_profit') if v is not None]
+            estimated = [e for r, e in zip(self.trades.column('real_profit'), self.estimated_profits())
+                         if r is not None and e is not None]
+            bought = [(date, amount, work_time) for date, amount, work_time, buy_price in zip(
+                self.trades.column('date'),
+                self.trades.column('trade_amount_per_thread'),
+                self.trades.column('work_time_secs'),
+                self.trades.column('buy_price')) if buy_price is not None and date is not None]
+            finished = self.trades.rows
+
+        report = '    - Signals: {0} approved, {1} ignored\n'.format(approved, ignored)
+        for reason, count in ignore_reasons:
+            report += '        * {0}: {1}\n'.format(reason, count)
+        report += '    - Trades: {0} finished, {1} sold\n'.format(finished, len(real_profits))
+        if len(real_profits) > 0:
+            report += '        * win rate: {0:.0f}%\n'.format(
+                sum(1 for v in real_profits if v > 0) / len(real_profits) * 100)
+            report += '        * avg real profit: {0:.2f}%\n'.format(sum(real_profits) / len(real_profits))
+        if len(estimated) > 0:
+            report += '        * avg estimated profit: {0:.2f}%\n'.format(sum(estimated) / len(estimated))
+        report += '    - Cancel reasons:\n'
+        for reason, count in cancel_reasons:
+            report += '        * {0}: {1}\n'.format(reason, count)
+        report += '    - Sell reasons:\n'
+        for reason, count in sell_reasons:
+            report += '        * {0}: {1}\n'.format(reason, count)
+        if len(bought) > 0:
+            dates = sorted(date for date, _, _ in bought)
+            days = max((datetime.datetime.strptime(dates[-1][:19], '%Y-%m-%d %H:%M:%S') -
+                        datetime.datetime.strptime(dates[0][:19], '%Y-%m-%d %H:%M:%S')).total_seconds() / 86400, 1)
+            traded = sum(amount or 0.0 for _, amount, _ in bought)
+            report += '    - Capital turnover: {0:.2f}$ over {1:.1f} days ({2:.2f}$ a day), ' \
+                      '{3:.0f}s avg work time\n'.format(
+                traded,
+                days,
+                traded / days,
+                sum(work_time or 0.0 for _, _, work_time in bought) / len(bought))
+        return report
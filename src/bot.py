@@ -1,8 +1,16 @@
+import time
+import atexit
+
 from telegram.ext import Updater, CommandHandler
+from telegram.error import RetryAfter
 from xml.etree import ElementTree
+from queue import Queue, Empty
+from threading import Thread
 
+from .metrics import registry
 from .util import PoolObject, form_traceback, get_btc_price
-from .constants import proxy_host, proxy_port, tg_bot_config
+from .constants import proxy_host, proxy_port, tg_bot_config, bot_message_period, bot_message_limit, \
+    bot_send_tries, bot_stop_timeout, profiler_components
 
 
 class Bot(PoolObject):
@@ -19,6 +27,10 @@ class Bot(PoolObject):
         else:
             self.updater = Updater(self.meta['bot_token'])
         self.dispatcher = self.updater.dispatcher
+        self.sender = BotSenderThread(self)
+        self.sender.setDaemon(True)
+        self.sender.start()
+        atexit.register(self.sender.stop)
         self.add_handlers()
         self.updater.start_polling()
         self.available = True
@@ -39,24 +51,32 @@ class Bot(PoolObject):
         return str(chat_id) == self.meta['owner_id']
 
     def send(self, tokens):
-        try:
-            tokens = [str(token) for token in tokens]
-            self.updater.bot.send_message(self.meta['owner_id'], '\n'.join(tokens))
-        except Exception as exc:
-            print('failed to send message: {0}, through bot: {1}'.format(tokens, exc))
-            self.updater.bot.send_message(self.meta['owner_id'], '\n'.join(tokens))
+        tokens = [str(token) for token in tokens]
+        self.sender.put(self.meta['owner_id'], '\n'.join(tokens))
+        registry.counter('bot_messages_total').inc()
 
     def add_handlers(self):
         self.dispatcher.add_handler(CommandHandler('say_hi', self.say_hi))
         self.dispatcher.add_handler(CommandHandler('get_predictor_report', self.get_predictor_report))
         self.dispatcher.add_handler(CommandHandler('get_scribe_report', self.get_scribe_report))
         self.dispatcher.add_handler(CommandHandler('get_trader_report', self.get_trader_report))
+        self.dispatcher.add_handler(CommandHandler('get_perf_report', self.get_perf_report))
+        self.dispatcher.add_handler(CommandHandler('get_memory_report', self.get_memory_report))
+        self.dispatcher.add_handler(CommandHandler('start_profiler', self.start_profiler))
+        self.dispatcher.add_handler(CommandHandler('stop_profiler', self.stop_profiler))
+        self.dispatcher.add_handler(CommandHandler('dump_stacks', self.dump_stacks))
+        self.dispatcher.add_handler(CommandHandler('memory_snapshot', self.memory_snapshot))
+        self.dispatcher.add_handler(CommandHandler('stop_memory_tracing', self.stop_memory_tracing))
+        self.dispatcher.add_handler(CommandHandler('get_analytics_report', self.get_analytics_report))
+        self.dispatcher.add_handler(CommandHandler('get_profit_report', self.get_profit_report))
         self.dispatcher.add_handler(CommandHandler('start_listener', self.start_listener))
         self.dispatcher.add_handler(CommandHandler('stop_listener', self.stop_listener))
         self.dispatcher.add_handler(CommandHandler('cur_listener_status', self.cur_listener_status))
         self.dispatcher.add_handler(CommandHandler('update_dataset', self.update_dataset))
         self.dispatcher.add_handler(CommandHandler('rewrite_dataset', self.rewrite_dataset))
         self.dispatcher.add_handler(CommandHandler('complete_dataset', self.complete_dataset))
+        self.dispatcher.add_handler(CommandHandler('jobs', self.jobs))
+        self.dispatcher.add_handler(CommandHandler('cancel_job', self.cancel_job))
         self.dispatcher.add_handler(CommandHandler('cur_dataset_size', self.cur_dataset_size))
         self.dispatcher.add_handler(CommandHandler('cur_btc_price', self.cur_btc_price))
         self.dispatcher.add_handler(CommandHandler('restore_threads', self.restore_threads))
@@ -90,6 +110,98 @@ class Bot(PoolObject):
         except Exception as exc:
             update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
 
+    def get_perf_report(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            update.message.reply_text('Performance:\n' + registry.get_report())
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def get_memory_report(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            update.message.reply_text('Memory:\n' + self.pool['memory'].get_report())
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def start_profiler(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            args = update.message.text.split()[1:]
+            component = args[0] if len(args) > 0 else 'all'
+            if component != 'all' and component not in profiler_components:
+                update.message.reply_text('Usage: /start_profiler [all|{0}]'.format('|'.join(profiler_components)))
+                return
+            if self.pool['profiler'].start_sampling(component):
+                update.message.reply_text('Started profiling ' + component + ', stop with /stop_profiler')
+            else:
+                update.message.reply_text('Profiler is already running')
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def stop_profiler(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            summary = self.pool['profiler'].stop_sampling()
+            if summary is None:
+                update.message.reply_text('Profiler is not running')
+            else:
+                update.message.reply_text('Profile:\n' + summary)
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def dump_stacks(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            update.message.reply_text('Stacks:\n' + self.pool['profiler'].dump_stacks())
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def memory_snapshot(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            update.message.reply_text('Memory:\n' + self.pool['profiler'].memory_snapshot())
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def stop_memory_tracing(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            if self.pool['profiler'].stop_memory_tracing():
+                update.message.reply_text('Stopped tracing allocations')
+            else:
+                update.message.reply_text('Allocations are not traced')
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def get_analytics_report(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            update.message.reply_text('Analytics:\n' + self.pool['scribe'].analytics.get_report())
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def get_profit_report(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            args = update.message.text.split()[1:]
+            by = args[0] if len(args) > 0 else 'exchange'
+            if by not in ['exchange', 'week', 'ticker']:
+                update.message.reply_text('Usage: /get_profit_report [exchange|week|ticker]')
+                return
+            update.message.reply_text('Analytics:\n' + self.pool['scribe'].analytics.get_profit_report(by))
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
     def start_listener(self, _, update):
         if not self.auth(update.message.chat_id):
             return
@@ -112,40 +224,73 @@ class Bot(PoolObject):
         if not self.auth(update.message.chat_id):
             return
         try:
+            counters = self.pool['client'].cur_listener_counters()
+            counters_str = ' (handled events: {0}, non-signal messages: {1})'.format(
+                counters['handled'],
+                counters['non_signal'])
             if self.pool['client'].cur_listener_status():
-                update.message.reply_text('Listener is active')
+                update.message.reply_text('Listener is active' + counters_str)
             else:
-                update.message.reply_text('Listener is inactive')
+                update.message.reply_text('Listener is inactive' + counters_str)
         except Exception as exc:
             update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
 
     def update_dataset(self, _, update):
         if not self.auth(update.message.chat_id):
             return
-        update.message.reply_text('Updating dataset...')
         try:
-            self.pool['client'].update_dataset()
-            update.message.reply_text('Dataset updated')
+            _, created = self.pool['jobs'].submit('update_dataset', self.pool['client'].update_dataset, notify=True)
+            if created:
+                update.message.reply_text('Updating dataset in the background, see /jobs')
+            else:
+                update.message.reply_text('Dataset update is already queued or running, see /jobs')
         except Exception as exc:
             update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
 
     def rewrite_dataset(self, _, update):
         if not self.auth(update.message.chat_id):
             return
-        update.message.reply_text('Rewriting dataset...')
         try:
-            self.pool['client'].rewrite_dataset()
-            update.message.reply_text('Dataset rewritten')
+            _, created = self.pool['jobs'].submit('rewrite_dataset', self.pool['client'].rewrite_dataset, notify=True)
+            if created:
+                update.message.reply_text('Rewriting dataset in the background, see /jobs')
+            else:
+                update.message.reply_text('Dataset rewrite is already queued or running, see /jobs')
         except Exception as exc:
             update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
 
     def complete_dataset(self, _, update):
         if not self.auth(update.message.chat_id):
             return
-        update.message.reply_text('Completing dataset...')
         try:
-            self.pool['client'].complete_dataset()
-            update.message.reply_text('Dataset completed')
+            _, created = self.pool['jobs'].submit('complete_dataset', self.pool['client'].complete_dataset, notify=True)
+            if created:
+                update.message.reply_text('Completing dataset in the background, see /jobs')
+            else:
+                update.message.reply_text('Dataset completion is already queued or running, see /jobs')
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def jobs(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            update.message.reply_text('Jobs:\n' + self.pool['jobs'].get_report())
+        except Exception as exc:
+            update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+    def cancel_job(self, _, update):
+        if not self.auth(update.message.chat_id):
+            return
+        try:
+            args = update.message.text.split()[1:]
+            if len(args) == 0:
+                update.message.reply_text('Usage: /cancel_job <name>')
+                return
+            if self.pool['jobs'].cancel(args[0]):
+                update.message.reply_text('Cancelling job ' + args[0])
+            else:
+                update.message.reply_text('No queued or running job ' + args[0])
         except Exception as exc:
             update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
 
@@ -179,3 +324,100 @@ class Bot(PoolObject):
 
         except Exception as exc:
             update.message.reply_text('Something wrong happened:\n' + form_traceback(exc))
+
+
+class BotSenderThread(Thread):
+    def __init__(self, bot):
+        Thread.__init__(self)
+        self.bot = bot
+        self.queue = Queue()
+        self.pending = {}
+        self.next_send = {}
+        self.failures = {}
+
+    def put(self, chat_id, text):
+        if text != '':
+            self.queue.put((chat_id, text))
+
+    def stop(self):
+        if self.is_alive():
+            self.queue.put(None)
+            self.join(bot_stop_timeout)
+
+    def run(self):
+        stopping = False
+        while True:
+            timeout = None
+            if len(self.pending) > 0:
+                timeout = max(min(self.next_send.get(chat_id, 0) for chat_id in self.pending) - time.time(), 0)
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                item = ()
+            if item is None:
+                stopping = True
+            elif item:
+                chat_id, text = item
+                self.pending.setdefault(chat_id, []).append(text)
+            for chat_id in list(self.pending):
+                if time.time() >= self.next_send.get(chat_id, 0):
+                    self.flush(chat_id)
+            if stopping and len(self.pending) == 0:
+                return
+
+    @staticmethod
+    def split(text):
+        parts = []
+        part = ''
+        for line in text.split('\n'):
+            while len(line) > bot_message_limit:
+                if part != '':
+                    parts.append(part)
+                    part = ''
+                parts.append(line[:bot_message_limit])
+                line = line[bot_message_limit:]
+            if part != '' and len(part) + 1 + len(line) > bot_message_limit:
+                parts.append(part)
+                part = ''
+            part = line if part == '' else part + '\n' + line
+        if part != '':
+            parts.append(part)
+        return parts
+
+    @staticmethod
+    def pack(texts):
+        # messages queued while the chat was rate limited go out as one
+        messages = []
+        for text in texts:
+            for part in BotSenderThread.split(text):
+                if len(messages) > 0 and len(messages[-1]) + 2 + len(part) <= bot_message_limit:
+                    messages[-1] += '\n\n' + part
+                else:
+                    messages.append(part)
+        return messages
+
+    def flush(self, chat_id):
+        messages = self.pack(self.pending.pop(chat_id))
+        start = time.time()
+        try:
+            self.bot.updater.bot.send_message(chat_id, messages[0])
+        except RetryAfter as exc:
+            registry.counter('bot_send_errors_total', error='flood').inc()
+            self.pending[chat_id] = messages
+            self.next_send[chat_id] = time.time() + exc.retry_after
+            return
+        except Exception as exc:
+            registry.counter('bot_send_errors_total', error='other').inc()
+            failures = self.failures.get(chat_id, 0) + 1
+            if failures < bot_send_tries:
+                self.failures[chat_id] = failures
+                self.pending[chat_id] = messages
+                self.next_send[chat_id] = time.time() + bot_message_period * 2 ** failures
+                return
+            print('failed to send message: {0}, through bot: {1}'.format(messages[0], exc))
+        finally:
+            registry.histogram('bot_send_seconds').observe(time.time() - start)
+        self.failures.pop(chat_id, None)
+        if len(messages) > 1:
+            self.pending[chat_id] = messages[1:]
+        self.next_send[chat_id] = time.time() + bot_message_period
@@ -6,7 +6,7 @@ from telethon import TelegramClient, events, utils
 from telethon.errors import SessionPasswordNeededError
 
 from .util import PoolObject, form_traceback
-from .constants import data, client_tg_session, proxy_host, proxy_port, tg_client_config
+from .constants import data, client_tg_session, proxy_host, proxy_port, tg_client_config, history_chunk_size
 
 
 class Client(TelegramClient, PoolObject):
@@ -15,6 +15,10 @@ class Client(TelegramClient, PoolObject):
 
         self.meta = self.parse_xml()
         self.listener_status = False
+        self.listener_event = None
+        self.handled_events = 0
+        self.non_signal_messages = 0
+        self.cryptoping_entity = None
         if not os.path.exists(data):
             os.makedirs(data)
         if use_proxy:
@@ -63,56 +67,108 @@ class Client(TelegramClient, PoolObject):
         return meta
 
     def update_handler(self, update):
+        self.handled_events += 1
         update = update.original_update
-        if str(update.user_id) == self.meta['cryptoping_bot_id'] and update.message.startswith('💎'):
-            try:
-                self.pool['collector'].process_signal(update)
-            except Exception as exc:
-                self.pool['bot'].send(['Something wrong happened:', form_traceback(exc)])
+        if not update.message.startswith('💎'):
+            self.non_signal_messages += 1
+            return
+        try:
+            self.pool['collector'].process_signal(update)
+        except Exception as exc:
+            self.pool['bot'].send(['Something wrong happened:', form_traceback(exc)])
 
     def start_listener(self):
         if self.listener_status:
             return
         self.listener_status = True
-        self.add_event_handler(self.update_handler, events.NewMessage)
+        self.listener_event = events.NewMessage(chats=int(self.meta['cryptoping_bot_id']), incoming=True)
+        self.add_event_handler(self.update_handler, self.listener_event)
 
     def stop_listener(self):
         if not self.listener_status:
             return
         self.listener_status = False
-        self.remove_event_handler(self.update_handler, events.NewMessage)
+        self.remove_event_handler(self.update_handler, self.listener_event)
+        self.listener_event = None
 
     def cur_listener_status(self):
         return self.listener_status
 
+    def cur_listener_counters(self):
+        return {
+            'handled': self.handled_events,
+            'non_signal': self.non_signal_messages
+        }
+
     def get_cryptoping_entity(self):
+        if self.cryptoping_entity is not None:
+            return self.cryptoping_entity
+        try:
+            self.cryptoping_entity = self.get_input_entity(int(self.meta['cryptoping_bot_id']))
+            return self.cryptoping_entity
+        except (ValueError, TypeError):
+            pass
         dialogs = self.get_dialogs()
         for dialog in dialogs:
             if utils.get_display_name(dialog.entity) == 'CryptoPing':
-                return dialog.entity
+                self.cryptoping_entity = dialog.entity
+                return self.cryptoping_entity
         return None
 
-    def update_dataset(self):
+    def invalidate_cryptoping_entity(self):
+        self.cryptoping_entity = None
+
+    def iter_history_chunks(self, entity, min_id=0):
+        cursor = min_id
+        while True:
+            chunk = self.get_messages(
+                entity,
+                limit=history_chunk_size,
+                offset_id=max(cursor, 1),
+                add_offset=-history_chunk_size)
+            chunk = sorted([msg for msg in chunk if msg.id > cursor], key=lambda msg: msg.id)
+            if len(chunk) == 0:
+                return
+            cursor = chunk[-1].id
+            signals = [msg for msg in chunk if msg.message is not None and msg.message.startswith('💎')]
+            yield signals, cursor
+
+    @staticmethod
+    def report_progress(job, signals, last_id):
+        if job is None:
+            return
+        job.progress = '{0} signals read, last message id {1}'.format(signals, last_id)
+        job.check()
+
+    def update_dataset(self, job=None):
         cryptoping_dialog_entity = self.get_cryptoping_entity()
-        messages = []
-        for msg in reversed(self.get_messages(
-                cryptoping_dialog_entity,
-                limit=None,
-                min_id=self.pool['collector'].meta['last_signal_id'])):
-            if msg.message.startswith('💎'):
-                messages.append(msg)
-        self.pool['collector'].update_dataset(messages)
-
-    def rewrite_dataset(self):
+        min_id = self.pool['collector'].meta['last_signal_id']
+        count = 0
+        try:
+            for signals, last_id in self.iter_history_chunks(cryptoping_dialog_entity, min_id):
+                self.pool['collector'].update_dataset(signals, last_id)
+                count += len(signals)
+                self.report_progress(job, count, last_id)
+        except Exception:
+            self.invalidate_cryptoping_entity()
+            raise
+
+    def rewrite_dataset(self, job=None):
+        # an interrupted rewrite is resumed by update_dataset from the last checkpointed id
         cryptoping_dialog_entity = self.get_cryptoping_entity()
-        messages = []
-        for msg in reversed(self.get_messages(cryptoping_dialog_entity, limit=None)):
-            if msg.message.startswith('💎'):
-                messages.append(msg)
-        self.pool['collector'].update_dataset(messages, rewrite=True)
-
-    def complete_dataset(self):
-        self.pool['collector'].complete_dataset()
+        self.pool['collector'].reset_dataset()
+        count = 0
+        try:
+            for signals, last_id in self.iter_history_chunks(cryptoping_dialog_entity):
+                self.pool['collector'].update_dataset(signals, last_id)
+                count += len(signals)
+                self.report_progress(job, count, last_id)
+        except Exception:
+            self.invalidate_cryptoping_entity()
+            raise
+
+    def complete_dataset(self, job=None):
+        self.pool['collector'].complete_dataset(job)
 
     def cur_dataset_size(self):
         return self.pool['collector'].meta['dataset_size']
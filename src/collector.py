@@ -1,3 +1,4 @@
+import os
 import csv
 import re
 import time
@@ -5,13 +6,11 @@ import requests
 
 from xml.etree import ElementTree
 from datetime import datetime
-from threading import RLock
 
+from .metrics import registry, timed
 from .util import PoolObject, get_btc_price
 from .constants import collector_config, allowed_exchanges, volume_threshold, predictor_dataset
 
-lock = RLock()
-
 
 class Collector(PoolObject):
     def __init__(self):
@@ -46,7 +45,9 @@ class Collector(PoolObject):
         root[4].text = str(self.meta['last_signal_id'])
         tree.write(collector_config)
 
+    @timed('collector_process_signal_seconds')
     def process_signal(self, msg):
+        received = time.time()
         signal = Collector.parse_message(msg)
         signal['buy_vol_per'] = float(signal['buy_vol_per'])
         signal['buy_vol_btc'] = float(signal['buy_vol_btc'])
@@ -62,17 +63,8 @@ class Collector(PoolObject):
         signal['bpi'] = get_btc_price()
         signal['volume'] = signal['buy_vol_btc'] / signal['buy_vol_per'] * 100 * 24
 
-        waiting_time = 0
-        while True:
-            with lock:
-                available = self.pool['predictor'].available
-            if available:
-                break
-            time.sleep(1)
-            waiting_time += 1
-            if waiting_time >= 60:
-                self.pool['bot'].send(['Collector:', 'Predictor is not available, waiting to process signal...'])
-                waiting_time = 0
+        while not self.pool['predictor'].wait_available(60):
+            self.pool['bot'].send(['Collector:', 'Predictor is not available, waiting to process signal...'])
 
         pred = self.pool['predictor'].predict(signal)
         metrics = self.pool['predictor'].metrics
@@ -80,14 +72,12 @@ class Collector(PoolObject):
         ignore_reason = None
 
         if signal['exchange'] in allowed_exchanges:
-            with lock:
-                locked = self.pool['trader'].locks[signal['exchange']]
-            if locked:
-                ignore_reason = 'exchange balance locked'
-            elif float(signal['volume']) * float(signal['bpi']) < volume_threshold:
+            if float(signal['volume']) * float(signal['bpi']) < volume_threshold:
                 ignore_reason = 'low volume'
             elif pred < metrics['preds_75_percentile']:
                 ignore_reason = 'low estimated profit'
+            else:
+                ignore_reason = self.pool['trader'].admit(signal)
         else:
             ignore_reason = 'not allowed exchange'
 
@@ -98,9 +88,9 @@ class Collector(PoolObject):
                 '    - Exchange: ' + signal['exchange'],
                 '    - Signal price: {0:.8f}'.format(signal['price_btc']),
                 '    - Estimated profit: ' + str(signal['estimated_profit'])])
-            with lock:
-                self.pool['scribe'].approved(signal)
-            self.pool['trader'].make_trade(signal)
+            self.pool['scribe'].approved(signal)
+            registry.counter('collector_signals_total', result='approved').inc()
+            self.pool['trader'].make_trade(signal, received=received)
         else:
             signal['ignore_reason'] = ignore_reason
             self.pool['bot'].send([
@@ -110,8 +100,8 @@ class Collector(PoolObject):
                 '    - Signal price: {0:.8f}'.format(signal['price_btc']),
                 '    - Estimated profit: ' + str(signal['estimated_profit']),
                 '    - Ignore reason: ' + signal['ignore_reason']])
-            with lock:
-                self.pool['scribe'].ignored(signal)
+            self.pool['scribe'].ignored(signal)
+            registry.counter('collector_signals_total', result='ignored').inc()
 
     @staticmethod
     def parse_message(msg):
@@ -161,29 +151,34 @@ class Collector(PoolObject):
             i += 16
         return parsed_signals
 
-    def update_dataset(self, new_items, rewrite=False):
+    def reset_dataset(self):
+        open(predictor_dataset, 'w').close()
+        self.meta['dataset_size'] = 0
+        self.meta['last_signal_id'] = 0
+        self.update_xml()
+
+    def update_dataset(self, new_items, last_signal_id=None):
         messages = []
         for item in new_items:
             parsed_message = self.parse_message(item)
             if str(parsed_message['date']) not in self.meta['signal_exceptions']:
-                messages.append(self.parse_message(item))
-        if len(messages) == 0:
-            return
-        columns = messages[0].keys()
-        write_mode = 'w' if rewrite else 'a'
-        with open(predictor_dataset, write_mode, newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=columns)
-            if rewrite:
-                writer.writeheader()
-            writer.writerows(messages)
-        if rewrite:
-            self.meta['dataset_size'] = len(messages)
-        else:
+                messages.append(parsed_message)
+        if len(messages) > 0:
+            columns = messages[0].keys()
+            write_header = not os.path.isfile(predictor_dataset) or os.path.getsize(predictor_dataset) == 0
+            with open(predictor_dataset, 'a', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=columns)
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(messages)
             self.meta['dataset_size'] += len(messages)
-        self.meta['last_signal_id'] = messages[-1]['id']
-        self.update_xml()
+            self.meta['last_signal_id'] = messages[-1]['id']
+        if last_signal_id is not None:
+            self.meta['last_signal_id'] = last_signal_id
+        if len(messages) > 0 or last_signal_id is not None:
+            self.update_xml()
 
-    def complete_dataset(self):
+    def complete_dataset(self, job=None):
         completed_samples = []
         samples_to_complete = []
         recent_samples = []
@@ -208,6 +203,10 @@ class Collector(PoolObject):
         i = 0
         not_completed = True
         while not_completed:
+            if job is not None:
+                # nothing is written until every sample is completed, so stopping between pages is safe
+                job.progress = 'page {0}, {1} of {2} samples completed'.format(page, i, len(samples_to_complete))
+                job.check()
             page += 1
             cookie = {self.meta['cryptoping_session_name']: self.meta['cryptoping_session']}
             url = str(self.meta['cryptoping_url']) + str(page)
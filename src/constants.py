@@ -14,6 +14,9 @@ scribe_approved_signals = 'data/scribe_approved.csv'
 scribe_finished_trades = 'data/scribe_trades.csv'
 trained_model = 'data/trained_model/'
 trader_dumps = 'data/trader_dumps/'
+trader_journal = 'data/trader_journal'
+markets_cache = 'data/markets/'
+profiles = 'data/profiles/'
 
 predictor_target_col = '24h_per'
 
@@ -44,6 +47,20 @@ allowed_exchanges = [
     # 'Tidex'
 ]
 
+exchange_client_ids = {
+    'Bittrex': 'bittrex',
+    'Poloniex': 'poloniex',
+    'YoBit': 'yobit',
+    'HitBTC': 'hitbtc2',
+    'Tidex': 'tidex',
+    'Binance': 'binance',
+    'Bitfinex': 'bitfinex'
+}
+
+exchange_client_options = {
+    'Binance': {'adjustForTimeDifference': True}
+}
+
 necessary_exchange_methods = [
     'cancelOrder',
     'createOrder',
@@ -59,6 +76,11 @@ necessary_exchange_methods = [
     'withdraw'
 ]
 
+# a timeout may arrive after the exchange accepted the call, retrying these would repeat it
+non_retryable_methods = [
+    'create_order'
+]
+
 report_cols = [
     'date',
     'symbol',
@@ -67,6 +89,9 @@ report_cols = [
     'bpi',
     'trade_amount_per_thread',
     'time_to_trade_secs',
+    'time_to_order_secs',
+    'order_attempts',
+    'expected_slippage',
     'estimated_profit',
     'real_profit',
     'buy_price',
@@ -75,8 +100,49 @@ report_cols = [
     'sell_reason'
 ]
 
+analytics_numeric_cols = [
+    'signal_price',
+    'bpi',
+    'trade_amount_per_thread',
+    'estimated_profit',
+    'real_profit',
+    'buy_price',
+    'sell_price',
+    'work_time_secs'
+]
+
+# weight of every ccxt call in rate limiter tokens, missing methods weigh 1
+api_call_weights = {
+    'fetch_balance': 2,
+    'fetch_tickers': 2,
+    'fetch_open_orders': 2,
+    'fetch_closed_orders': 2,
+    'fetch_l2_order_book': 2
+}
+
+# latency histogram bucket bounds in seconds, and where to serve them in Prometheus format (None to disable)
+metrics_buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+metrics_http_host = '127.0.0.1'
+metrics_http_port = None
+
+# modules whose frames a component profile keeps, any other component name profiles the whole process
+profiler_components = {
+    'collector': ['collector.py'],
+    'predictor': ['predictor.py'],
+    'trader': ['trader.py', 'market.py', 'orders.py', 'ledger.py', 'limiter.py', 'retry.py', 'execution.py']
+}
+
+# fetch balance, ticker and markets concurrently before the first buy order
+fast_entry = True
+
+# price orders from the order book so the whole quantity fills within the tolerance
+order_book_pricing = True
+order_book_depth = 20
+
 # in percent
 exchanges_fees = {
+    'Poloniex': 0.0025,
+    'Bitfinex': 0.002,
     'YoBit': 0.002,
     'Cryptopia': 0.002,
     'Bittrex': 0.0025,
@@ -84,17 +150,75 @@ exchanges_fees = {
     'Binance': 0.001
 }
 
+# messages
+history_chunk_size = 100
+
+# requests
+rate_limiter_capacity = 1
+breaker_failure_threshold = 5
+bot_send_tries = 5
+
 # dollars
 volume_threshold = 2000
 trade_amount_per_thread = 10
 
+# concurrent trades and BTC reserved for them on every exchange, overridable per exchange
+trade_slots_per_exchange = 3
+trade_budget_per_exchange = 0.01
+exchanges_trade_slots = {}
+exchanges_trade_budget = {}
+
 # percent
 max_price_decrease = -5
+order_book_tolerance = 1
 
 # seconds
 learning_period = 86400
-thread_cleaning_period = 43200
 trade_time_period = 86400
-garbage_cleaning_period = 10800
 pending_order_time = 20
 max_tries_to_call_api = 10
+market_poll_period = 2
+market_quote_timeout = 60
+market_quote_max_age = 30
+order_poll_period = 2
+order_status_timeout = 60
+balance_reconcile_period = 300
+report_exchange_timeout = 20
+report_ticker_timeout = 5
+journal_sync_period = 1
+markets_cache_ttl = 86400
+markets_retry_period = 60
+retry_base_delay = 1
+retry_max_delay = 30
+breaker_reset_period = 30
+scribe_flush_period = 1
+bot_message_period = 1
+bot_stop_timeout = 10
+profiler_sample_period = 0.01
+profiler_max_duration = 600
+profiler_stacks_timeout = 5
+memory_check_period = 60
+
+# megabytes of resident memory: collect past the threshold once it grew by the step, alert past the limit
+memory_gc_threshold = 1024
+memory_gc_growth = 256
+memory_alert_threshold = 2048
+
+# young generation threshold doubles while its collections find fewer objects per run, up to the cap
+memory_gc_min_yield = 1
+memory_gc_max_threshold = 50000
+
+# characters
+bot_message_limit = 4096
+
+# bytes
+scribe_read_block = 65536
+
+# records
+journal_compact_records = 10000
+finished_trades_history = 100
+finished_trades_reported = 10
+scribe_flush_records = 100
+analytics_report_rows = 20
+jobs_history = 20
+profiler_summary_rows = 10
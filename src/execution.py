@@ -0,0 +1,33 @@
+def price_from_book(levels, amount, side, tolerance, in_btc=False):
+    if len(levels) == 0:
+        return None
+    best = levels[0][0]
+    if side == 'buy':
+        bound = best * (1 + tolerance / 100.0)
+    else:
+        bound = best * (1 - tolerance / 100.0)
+
+    price = best
+    filled = 0.0
+    cost = 0.0
+    complete = False
+    for level in levels:
+        level_price, level_volume = level[0], level[1]
+        if (side == 'buy' and level_price > bound) or (side == 'sell' and level_price < bound):
+            break
+        price = level_price
+        remaining = amount - cost if in_btc else amount - filled
+        available = level_volume * level_price if in_btc else level_volume
+        if available >= remaining:
+            portion = remaining / level_price if in_btc else remaining
+            filled += portion
+            cost += portion * level_price
+            complete = True
+            break
+        filled += level_volume
+        cost += level_volume * level_price
+    # a book too thin within the tolerance would leave the order partially filled at a price that looked fine
+    if not complete or filled == 0:
+        return None
+    slippage = abs(cost / filled / best - 1) * 100
+    return price, slippage
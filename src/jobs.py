@@ -0,0 +1,133 @@
+import time
+
+from queue import Queue
+from threading import Thread, Lock, Event
+from collections import deque
+
+from .util import PoolObject, form_traceback
+from .constants import jobs_history
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, name, func, notify=False):
+        self.name = name
+        self.func = func
+        self.notify = notify
+        self.state = 'queued'
+        self.progress = None
+        self.cancelled = False
+        self.exception = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.done = Event()
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled('job ' + self.name + ' was cancelled')
+
+    def result(self):
+        self.done.wait()
+        if self.exception is not None:
+            raise self.exception
+
+
+class JobManager(PoolObject):
+    def __init__(self):
+        PoolObject.__init__(self)
+
+        self.lock = Lock()
+        self.queue = Queue()
+        self.active = {}
+        self.history = deque(maxlen=jobs_history)
+        self.worker = JobWorkerThread(self)
+        self.worker.setDaemon(True)
+        self.worker.start()
+        self.available = True
+
+        print('jobs: started')
+
+    def submit(self, name, func, notify=False):
+        with self.lock:
+            # the same job queued twice would only repeat the work, hand out the pending one instead
+            if name in self.active:
+                return self.active[name], False
+            job = Job(name, func, notify)
+            self.active[name] = job
+            self.history.append(job)
+        self.queue.put(job)
+        return job, True
+
+    def cancel(self, name):
+        with self.lock:
+            job = self.active.get(name)
+            if job is None:
+                return False
+            job.cancelled = True
+            return True
+
+    def run_job(self, job):
+        try:
+            job.check()
+            job.state = 'running'
+            job.started = time.time()
+            job.func(job)
+            job.state = 'finished'
+        except JobCancelled as exc:
+            job.state = 'cancelled'
+            job.exception = exc
+        except Exception as exc:
+            job.state = 'failed'
+            job.exception = exc
+        finally:
+            job.finished = time.time()
+            with self.lock:
+                del self.active[job.name]
+            job.done.set()
+        if job.notify:
+            tokens = ['Jobs:', 'Job {0} {1} in {2:.0f}s'.format(
+                job.name,
+                job.state,
+                job.finished - (job.started or job.created))]
+            if job.state == 'failed':
+                tokens.append(form_traceback(job.exception))
+            self.pool['bot'].send(tokens)
+
+    def get_report(self):
+        with self.lock:
+            jobs = list(self.history)
+        if len(jobs) == 0:
+            return '    - None\n'
+        report = ''
+        now = time.time()
+        for job in reversed(jobs):
+            report += '    - {0}: {1}\n'.format(job.name, job.state)
+            if job.state == 'queued':
+                report += '        * queued for: {0:.0f}s\n'.format(now - job.created)
+            elif job.state == 'running':
+                report += '        * running for: {0:.0f}s\n'.format(now - job.started)
+            else:
+                report += '        * finished: {0:.0f}s ago\n'.format(now - job.finished)
+            if job.progress is not None:
+                report += '        * progress: {0}\n'.format(job.progress)
+            if job.cancelled and job.state in ['queued', 'running']:
+                report += '        * cancelling\n'
+            if job.state == 'failed':
+                report += '        * error: {0}\n'.format(str(job.exception))
+        return report
+
+
+class JobWorkerThread(Thread):
+    def __init__(self, manager):
+        Thread.__init__(self)
+        self.manager = manager
+
+    def run(self):
+        # one worker, so jobs touching the dataset never overlap
+        while True:
+            job = self.manager.queue.get()
+            self.manager.run_job(job)
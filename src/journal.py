@@ -0,0 +1,113 @@
+import os
+import json
+import time
+
+from threading import Lock
+
+from .constants import journal_compact_records
+
+
+class TradeJournal:
+    def __init__(self, filename):
+        self.filename = filename
+        # lock guards states and the buffer and is held only briefly, file_lock serializes the disk work
+        self.lock = Lock()
+        self.file_lock = Lock()
+        self.states = {}
+        self.buffer = []
+        self.records = 0
+        self.synced = time.time()
+        self.file = None
+
+        directory = os.path.dirname(filename)
+        if directory != '' and not os.path.exists(directory):
+            os.makedirs(directory)
+        torn = self.load()
+        if torn:
+            self.compact(self.states)
+            self.records = len(self.states)
+        else:
+            self.file = open(self.filename, 'a')
+
+    def load(self):
+        if not os.path.isfile(self.filename):
+            return False
+        with open(self.filename, 'rb+') as file:
+            content = file.read()
+            end = content.rfind(b'\n') + 1
+            if end < len(content):
+                # a crash in the middle of a write leaves a partial last line, the next record would be glued to it
+                file.truncate(end)
+        for line in content[:end].decode().split('\n')[:-1]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return True
+            self.apply(record)
+            self.records += 1
+        return False
+
+    def apply(self, record):
+        if record.get('removed'):
+            self.states.pop(record['key'], None)
+        else:
+            self.states.setdefault(record['key'], {}).update(record['changes'])
+
+    def append(self, record):
+        self.apply(record)
+        self.buffer.append(json.dumps(record) + '\n')
+        self.records += 1
+
+    def record(self, key, state):
+        with self.lock:
+            previous = self.states.get(key, {})
+            changes = {k: v for k, v in state.items() if k not in previous or previous[k] != v}
+            if len(changes) == 0:
+                return
+            self.append({'key': key, 'changes': changes})
+
+    def remove(self, key):
+        with self.lock:
+            if key not in self.states:
+                return
+            self.append({'key': key, 'removed': True})
+
+    def sync(self):
+        # runs in an executor, callers on the event loop only ever wait for the short buffer swap
+        with self.file_lock:
+            with self.lock:
+                lines = self.buffer
+                self.buffer = []
+                states = None
+                if self.records > journal_compact_records and self.records > 2 * len(self.states):
+                    states = {key: dict(state) for key, state in self.states.items()}
+                    self.records = len(states)
+            if states is not None:
+                self.compact(states)
+            elif len(lines) > 0:
+                self.file.write(''.join(lines))
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.synced = time.time()
+
+    def compact(self, states):
+        if self.file is not None:
+            self.file.close()
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as file:
+            for key, state in states.items():
+                file.write(json.dumps({'key': key, 'changes': state}) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_filename, self.filename)
+        self.synced = time.time()
+        self.file = open(self.filename, 'a')
+
+    def get_states(self):
+        with self.lock:
+            return {key: dict(state) for key, state in self.states.items()}
+
+    def close(self):
+        self.sync()
+        with self.file_lock:
+            self.file.close()
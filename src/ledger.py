@@ -0,0 +1,117 @@
+import time
+import asyncio
+
+from .constants import balance_reconcile_period
+
+finished_order_statuses = ['closed', 'canceled', 'expired', 'rejected']
+balance_epsilon = 1e-8
+
+
+class BalanceLedger:
+    def __init__(self, trader, exchange):
+        self.trader = trader
+        self.exchange = exchange
+        self.free = {}
+        self.used = {}
+        self.orders = {}
+        self.updated = 0.0
+        self.dirty = True
+        self.lock = None
+        self.fetches = 0
+
+    def invalidate(self):
+        self.dirty = True
+
+    async def sync(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if not self.dirty and time.time() - self.updated < balance_reconcile_period:
+                return
+            balances = await self.trader.api(self.exchange, 'fetch_balance')
+            self.free = {k: float(v) for k, v in balances['free'].items() if v is not None}
+            self.used = {k: float(v) for k, v in balances['used'].items() if v is not None}
+            self.updated = time.time()
+            self.dirty = False
+            self.fetches += 1
+
+    async def get(self, category, ticker):
+        await self.sync()
+        if ticker not in (self.free if category == 'free' else self.used):
+            # the cached balances may predate a fill that brought the coin, re-read them once before giving up
+            self.invalidate()
+            await self.sync()
+        balances = self.free if category == 'free' else self.used
+        if ticker not in balances:
+            self.invalidate()
+            raise KeyError(ticker)
+        return balances[ticker]
+
+    async def get_balances(self):
+        await self.sync()
+        return {'free': dict(self.free), 'used': dict(self.used)}
+
+    def add(self, balances, ticker, quantity):
+        balances[ticker] = balances.get(ticker, 0.0) + quantity
+        if balances[ticker] < -balance_epsilon:
+            self.invalidate()
+
+    def move(self, ticker, quantity, source, target):
+        self.add(source, ticker, -quantity)
+        self.add(target, ticker, quantity)
+
+    def order_placed(self, order_id, symbol, side, amount, price):
+        base, quote = symbol.split('/')
+        amount = float(amount)
+        price = float(price)
+        self.orders[order_id] = {
+            'base': base,
+            'quote': quote,
+            'side': side,
+            'amount': amount,
+            'price': price,
+            'filled': 0.0
+        }
+        if side == 'buy':
+            self.move(quote, amount * price, self.free, self.used)
+        else:
+            self.move(base, amount, self.free, self.used)
+
+    def order_updated(self, order_info):
+        order = self.orders.get(order_info['id'])
+        if order is None:
+            return
+        filled = order_info.get('filled')
+        if filled is None:
+            filled = order['amount'] if order_info['status'] == 'closed' else order['filled']
+        delta = float(filled) - order['filled']
+        if delta > 0:
+            if order['side'] == 'buy':
+                self.add(self.used, order['quote'], -delta * order['price'])
+                self.add(self.free, order['base'], delta)
+            else:
+                self.add(self.used, order['base'], -delta)
+                self.add(self.free, order['quote'], delta * order['price'])
+            order['filled'] = float(filled)
+        if order_info['status'] in finished_order_statuses:
+            self.release(order_info['id'])
+            fee = order_info.get('fee')
+            if fee is not None and fee.get('currency') is not None and fee.get('cost') is not None:
+                self.add(self.free, fee['currency'], -float(fee['cost']))
+
+    def order_canceled(self, order_id):
+        # fills between the last status poll and the cancel are unknown, so the next read reconciles
+        self.release(order_id)
+        self.invalidate()
+
+    def release(self, order_id):
+        order = self.orders.pop(order_id, None)
+        if order is None:
+            return
+        remaining = order['amount'] - order['filled']
+        if remaining <= 0:
+            return
+        if order['side'] == 'buy':
+            self.move(order['quote'], remaining * order['price'], self.used, self.free)
+        else:
+            self.move(order['base'], remaining, self.used, self.free)
@@ -0,0 +1,45 @@
+import time
+import asyncio
+
+from .constants import rate_limiter_capacity, api_call_weights
+
+
+class RateLimiter:
+    def __init__(self, rate_limit_ms, capacity=rate_limiter_capacity):
+        self.rate = 1000.0 / rate_limit_ms
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+        self.calls = 0
+        self.queued_secs = 0.0
+        self.max_queued_secs = 0.0
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, method):
+        weight = api_call_weights.get(method, 1)
+        start = time.monotonic()
+        async with self.lock:
+            while True:
+                self.refill()
+                # heavy endpoints may overdraw the bucket, the next callers wait for the debt to be repaid
+                if self.tokens >= 1:
+                    self.tokens -= weight
+                    break
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+        delay = time.monotonic() - start
+        self.calls += 1
+        self.queued_secs += delay
+        self.max_queued_secs = max(self.max_queued_secs, delay)
+
+    def get_stats(self):
+        return {
+            'calls': self.calls,
+            'avg_queue_secs': self.queued_secs / self.calls if self.calls > 0 else 0.0,
+            'max_queue_secs': self.max_queued_secs
+        }
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import asyncio
+
+from os.path import join
+
+from .constants import market_poll_period, market_quote_timeout, markets_cache, markets_cache_ttl, \
+    markets_retry_period
+
+
+class MarketHub:
+    def __init__(self, trader, exchange):
+        self.trader = trader
+        self.exchange = exchange
+        self.bulk = bool(trader.exchanges[exchange].has.get('fetchTickers'))
+        self.quotes = {}
+        self.updated = {}
+        self.subscribers = {}
+        self.condition = None
+        self.poller = None
+        self.error = None
+        self.polls = 0
+
+    def subscribe(self, symbol):
+        self.subscribers[symbol] = self.subscribers.get(symbol, 0) + 1
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        if self.poller is None:
+            self.poller = asyncio.ensure_future(self.run())
+
+    def unsubscribe(self, symbol):
+        self.subscribers[symbol] -= 1
+        if self.subscribers[symbol] == 0:
+            self.subscribers.pop(symbol)
+
+    async def poll(self):
+        symbols = list(self.subscribers)
+        if self.bulk:
+            # a symbol-less call returns every pair, which some exchanges refuse or page past the url limit
+            markets = self.trader.exchanges[self.exchange].markets
+            if markets:
+                symbols = [symbol for symbol in symbols if symbol in markets]
+            if len(symbols) == 0:
+                return {}
+            tickers = await self.trader.api(self.exchange, 'fetch_tickers', symbols)
+            return {symbol: ticker for symbol, ticker in tickers.items() if symbol in self.subscribers}
+        results = await asyncio.gather(
+            *[self.trader.api(self.exchange, 'fetch_ticker', symbol) for symbol in symbols],
+            return_exceptions=True)
+        tickers = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                self.error = result
+            else:
+                tickers[symbol] = result
+        return tickers
+
+    async def run(self):
+        try:
+            while len(self.subscribers) > 0:
+                self.error = None
+                try:
+                    tickers = await self.poll()
+                except Exception as exc:
+                    self.error = exc
+                    tickers = {}
+                self.polls += 1
+                now = time.time()
+                async with self.condition:
+                    for symbol, ticker in tickers.items():
+                        self.quotes[symbol] = ticker
+                        self.updated[symbol] = now
+                    self.condition.notify_all()
+                await asyncio.sleep(market_poll_period)
+        finally:
+            self.poller = None
+
+    async def wait_ticker(self, symbol, since=0.0):
+        self.subscribe(symbol)
+        try:
+            async with self.condition:
+                await asyncio.wait_for(
+                    self.condition.wait_for(lambda: self.updated.get(symbol, 0.0) > since),
+                    market_quote_timeout)
+            return self.quotes[symbol], self.updated[symbol]
+        except asyncio.TimeoutError:
+            if self.error is not None:
+                raise self.error
+            raise
+        finally:
+            self.unsubscribe(symbol)
+
+
+class MarketsCache:
+    def __init__(self, trader, exchange, directory=markets_cache):
+        self.trader = trader
+        self.exchange = exchange
+        self.directory = directory
+        self.filename = join(directory, exchange + '.json')
+        self.lock = None
+        self.updated = None
+
+    def read(self):
+        if not os.path.isfile(self.filename):
+            return None
+        with open(self.filename, 'r') as file:
+            return json.load(file)
+
+    def write(self, cache):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w') as file:
+            json.dump(cache, file)
+        os.replace(tmp_filename, self.filename)
+
+    async def refresh(self):
+        client = self.trader.exchanges[self.exchange]
+        markets = await self.trader.api(self.exchange, 'load_markets', True)
+        cache = {'time': time.time(), 'markets': markets, 'currencies': client.currencies}
+        await asyncio.get_event_loop().run_in_executor(None, self.write, cache)
+        self.updated = cache['time']
+
+    async def load(self):
+        try:
+            cache = await asyncio.get_event_loop().run_in_executor(None, self.read)
+        except ValueError:
+            cache = None
+        if cache is not None and time.time() - cache['time'] < markets_cache_ttl:
+            self.trader.exchanges[self.exchange].set_markets(cache['markets'], cache['currencies'])
+            self.updated = cache['time']
+        else:
+            await self.refresh()
+
+    async def ensure(self):
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            if self.updated is None:
+                await self.load()
+
+    async def run(self):
+        while True:
+            try:
+                await self.ensure()
+                await asyncio.sleep(max(self.updated + markets_cache_ttl - time.time(), 0))
+                async with self.lock:
+                    await self.refresh()
+            except Exception:
+                await asyncio.sleep(markets_retry_period)
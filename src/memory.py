@@ -0,0 +1,175 @@
+import os
+import gc
+import time
+import resource
+
+from threading import Thread, Lock
+
+from .metrics import registry
+from .util import PoolObject, form_traceback
+from .constants import memory_check_period, memory_gc_threshold, memory_gc_growth, memory_alert_threshold, \
+    memory_gc_min_yield, memory_gc_max_threshold
+
+megabyte = 2 ** 20
+
+
+def get_rss():
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # peak rather than current, but the best there is without procfs
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryMonitor(PoolObject):
+    def __init__(self):
+        PoolObject.__init__(self)
+
+        self.lock = Lock()
+        self.rss = get_rss()
+        self.peak_rss = self.rss
+        self.collected_rss = self.rss
+        self.components = {}
+        self.trades = None
+        self.trades_growth = 0
+        self.collections = 0
+        self.freed = 0
+        self.alerted = False
+        self.gc_started = None
+        self.gc_pauses = [0.0, 0.0, 0.0]
+        self.default_threshold = gc.get_threshold()
+        self.young_stats = gc.get_stats()[0]
+        self.tunings = 0
+        gc.callbacks.append(self.on_gc)
+
+        self.thread = MemoryMonitorThread(self)
+        self.thread.setDaemon(True)
+        self.thread.start()
+        self.available = True
+
+        print('memory: started')
+
+    def on_gc(self, phase, info):
+        # a collection can start while this thread holds any lock, so only plain fields are touched here
+        if phase == 'start':
+            self.gc_started = time.time()
+        elif self.gc_started is not None:
+            pause = time.time() - self.gc_started
+            self.gc_pauses[info['generation']] = max(self.gc_pauses[info['generation']], pause)
+
+    @staticmethod
+    def freeze():
+        # models, clients and configs loaded at startup live forever, stop rescanning them
+        gc.collect()
+        gc.freeze()
+        print('memory: froze {0} startup objects'.format(gc.get_freeze_count()))
+
+    def measure(self):
+        components = {}
+        for name, entity in self.pool.items():
+            if hasattr(entity, 'get_memory_usage'):
+                try:
+                    components[name] = entity.get_memory_usage()
+                except Exception as exc:
+                    components[name] = {'error': str(exc)}
+        trades = self.pool['trader'].registry.count_active() if 'trader' in self.pool else 0
+        rss = get_rss()
+        # the gc callback writes the pauses without a lock, read them once
+        pauses = list(self.gc_pauses)
+        with self.lock:
+            self.rss = rss
+            self.peak_rss = max(self.peak_rss, rss)
+            self.components = components
+            self.trades_growth = 0 if self.trades is None else trades - self.trades
+            self.trades = trades
+        registry.gauge('memory_rss_bytes').set(rss)
+        for generation, pause in enumerate(pauses):
+            registry.gauge('gc_max_pause_seconds', generation=generation).set(pause)
+        return rss
+
+    def tune(self):
+        stats = gc.get_stats()[0]
+        runs = stats['collections'] - self.young_stats['collections']
+        collected = stats['collected'] - self.young_stats['collected']
+        self.young_stats = stats
+        threshold = gc.get_threshold()
+        # young collections that keep finding next to nothing only cost pauses, run them less often
+        if runs > 0 and collected < runs * memory_gc_min_yield and threshold[0] < memory_gc_max_threshold:
+            gc.set_threshold(min(threshold[0] * 2, memory_gc_max_threshold), *threshold[1:])
+            with self.lock:
+                self.tunings += 1
+        registry.gauge('gc_threshold', generation=0).set(gc.get_threshold()[0])
+
+    def check(self):
+        self.tune()
+        rss = self.measure()
+        # a full collection only pays off when memory grew since the last one, not on a timer
+        if rss > memory_gc_threshold * megabyte and rss - self.collected_rss > memory_gc_growth * megabyte:
+            # under pressure garbage must not wait for a raised threshold
+            gc.set_threshold(*self.default_threshold)
+            collected = gc.collect()
+            after = self.measure()
+            with self.lock:
+                self.collections += 1
+                self.freed += max(rss - after, 0)
+                self.collected_rss = after
+            registry.counter('memory_gc_collections_total').inc()
+            self.pool['bot'].send(['Memory:', 'Collected {0} objects, RSS {1:.0f} MB -> {2:.0f} MB'.format(
+                collected,
+                rss / megabyte,
+                after / megabyte)])
+            rss = after
+        if rss > memory_alert_threshold * megabyte and not self.alerted:
+            self.alerted = True
+            self.pool['bot'].send(['Memory:', 'RSS is above {0} MB:'.format(memory_alert_threshold), self.get_report()])
+        elif rss < memory_alert_threshold * megabyte * 0.9:
+            self.alerted = False
+
+    def get_report(self):
+        pauses = list(self.gc_pauses)
+        with self.lock:
+            report = '    - RSS: {0:.0f} MB now, {1:.0f} MB peak\n'.format(
+                self.rss / megabyte,
+                self.peak_rss / megabyte)
+            report += '    - Active trades: {0} ({1:+d} since the last check)\n'.format(
+                self.trades or 0,
+                self.trades_growth)
+            for name, usage in self.components.items():
+                report += '    - {0}:\n'.format(name.capitalize())
+                for k, v in usage.items():
+                    if k.endswith('_bytes'):
+                        report += '        * {0}: {1:.1f} MB\n'.format(k[:-6], v / megabyte)
+                    else:
+                        report += '        * {0}: {1}\n'.format(k, v)
+            report += '    - Garbage collector:\n'
+            report += '        * thresholds: {0} ({1} tunings), frozen objects: {2}\n'.format(
+                gc.get_threshold(),
+                self.tunings,
+                gc.get_freeze_count())
+            for generation, stats in enumerate(gc.get_stats()):
+                report += '        * gen {0}: {1} runs, {2} collected, {3} uncollectable, ' \
+                          '{4:.3f}s max pause\n'.format(
+                    generation,
+                    stats['collections'],
+                    stats['collected'],
+                    stats['uncollectable'],
+                    pauses[generation])
+            report += '        * pressure collections: {0}, freed {1:.0f} MB\n'.format(
+                self.collections,
+                self.freed / megabyte)
+        return report
+
+
+class MemoryMonitorThread(Thread):
+    def __init__(self, monitor):
+        Thread.__init__(self)
+        self.monitor = monitor
+
+    def run(self):
+        while True:
+            time.sleep(memory_check_period)
+            try:
+                self.monitor.check()
+            except Exception as exc:
+                self.monitor.pool['bot'].send(['Something wrong happened:', form_traceback(exc)])
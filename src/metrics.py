@@ -0,0 +1,183 @@
+import time
+import bisect
+import functools
+
+from threading import Lock, Thread
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from .constants import metrics_buckets
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self):
+        self.lock = Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, buckets=metrics_buckets):
+        self.lock = Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, percent):
+        # upper bound of the bucket holding the percentile, the last bucket reports the observed max
+        with self.lock:
+            counts = list(self.counts)
+            count = self.count
+        if count == 0:
+            return 0.0
+        rank = count * percent / 100.0
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = Lock()
+        self.metrics = {}
+
+    def get(self, cls, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.setdefault(key, cls())
+        return metric
+
+    def counter(self, name, **labels):
+        return self.get(Counter, name, labels)
+
+    def gauge(self, name, **labels):
+        return self.get(Gauge, name, labels)
+
+    def histogram(self, name, **labels):
+        return self.get(Histogram, name, labels)
+
+    def snapshot(self):
+        with self.lock:
+            return sorted(self.metrics.items(), key=lambda item: item[0])
+
+    @staticmethod
+    def format_name(name, labels):
+        if len(labels) == 0:
+            return name
+        return '{0}{{{1}}}'.format(name, ','.join('{0}="{1}"'.format(k, v) for k, v in labels))
+
+    def get_report(self):
+        report = ''
+        for (name, labels), metric in self.snapshot():
+            full_name = self.format_name(name, labels)
+            if metric.kind == 'histogram':
+                if metric.count == 0:
+                    continue
+                report += '    - {0}: {1} calls, {2:.4f}s avg, {3:.4f}s p50, {4:.4f}s p95, {5:.4f}s max\n'.format(
+                    full_name,
+                    metric.count,
+                    metric.sum / metric.count,
+                    metric.percentile(50),
+                    metric.percentile(95),
+                    metric.max)
+            else:
+                report += '    - {0}: {1}\n'.format(full_name, metric.value)
+        if report == '':
+            report = '    - None\n'
+        return report
+
+    def render_prometheus(self):
+        lines = []
+        kinds = {}
+        for (name, labels), metric in self.snapshot():
+            if name not in kinds:
+                kinds[name] = metric.kind
+                lines.append('# TYPE {0} {1}'.format(name, metric.kind))
+            if metric.kind != 'histogram':
+                lines.append('{0} {1}'.format(self.format_name(name, labels), metric.value))
+                continue
+            with metric.lock:
+                counts = list(metric.counts)
+                count = metric.count
+                total = metric.sum
+            cumulative = 0
+            for bound, bucket_count in zip(list(metric.buckets) + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append('{0} {1}'.format(
+                    self.format_name(name + '_bucket', labels + (('le', bound),)), cumulative))
+            lines.append('{0} {1}'.format(self.format_name(name + '_count', labels), count))
+            lines.append('{0} {1}'.format(self.format_name(name + '_sum', labels), total))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def timed(name, **labels):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.histogram(name, **labels).observe(time.time() - start)
+        return wrapper
+    return decorator
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != '/metrics':
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServerThread(Thread):
+    def __init__(self, host, port):
+        Thread.__init__(self)
+        self.server = HTTPServer((host, port), MetricsHandler)
+
+    def run(self):
+        self.server.serve_forever()
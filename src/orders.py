@@ -0,0 +1,114 @@
+import time
+import asyncio
+import ccxt
+
+from .constants import order_poll_period, order_status_timeout
+
+
+class OrderTracker:
+    def __init__(self, trader, exchange):
+        self.trader = trader
+        self.exchange = exchange
+        self.needs_symbol = False
+        self.orders = {}
+        self.statuses = {}
+        self.updated = {}
+        self.condition = None
+        self.poller = None
+        self.error = None
+        self.polls = 0
+
+    def track(self, order_id, symbol):
+        if order_id not in self.orders:
+            self.orders[order_id] = {'symbol': symbol, 'since': int(time.time() * 1000)}
+        if self.condition is None:
+            self.condition = asyncio.Condition()
+        if self.poller is None:
+            self.poller = asyncio.ensure_future(self.run())
+
+    def untrack(self, order_id):
+        self.orders.pop(order_id, None)
+        self.statuses.pop(order_id, None)
+        self.updated.pop(order_id, None)
+
+    async def fetch_orders(self, method, symbols, since=None):
+        if not self.needs_symbol:
+            try:
+                return await self.trader.api(self.exchange, method, since=since)
+            except (ccxt.ArgumentsRequired, ccxt.NotSupported):
+                self.needs_symbol = True
+        symbols = list(symbols)
+        results = await asyncio.gather(
+            *[self.trader.api(self.exchange, method, symbol, since=since) for symbol in symbols],
+            return_exceptions=True)
+        orders = []
+        for symbol, result in zip(symbols, results):
+            # one failing symbol must not hold back the statuses of the others
+            if isinstance(result, Exception):
+                self.error = result
+            else:
+                orders.extend(result)
+        return orders
+
+    async def poll(self):
+        symbols = set(order['symbol'] for order in self.orders.values())
+        statuses = {}
+        for order in await self.fetch_orders('fetch_open_orders', symbols):
+            if order['id'] in self.orders:
+                statuses[order['id']] = order
+
+        missing = [order_id for order_id in self.orders if order_id not in statuses]
+        if len(missing) > 0:
+            since = min(self.orders[order_id]['since'] for order_id in missing)
+            missing_symbols = set(self.orders[order_id]['symbol'] for order_id in missing)
+            for order in await self.fetch_orders('fetch_closed_orders', missing_symbols, since):
+                if order['id'] in self.orders:
+                    statuses[order['id']] = order
+
+        # orders that fell out of the closed orders window are fetched one by one
+        missing = [order_id for order_id in self.orders if order_id not in statuses]
+        results = await asyncio.gather(
+            *[self.trader.api(self.exchange, 'fetch_order', order_id, self.orders[order_id]['symbol'])
+              for order_id in missing],
+            return_exceptions=True)
+        for order_id, result in zip(missing, results):
+            if isinstance(result, Exception):
+                self.error = result
+            else:
+                statuses[order_id] = result
+        return statuses
+
+    async def run(self):
+        try:
+            while len(self.orders) > 0:
+                self.error = None
+                try:
+                    statuses = await self.poll()
+                except Exception as exc:
+                    self.error = exc
+                    statuses = {}
+                self.polls += 1
+                now = time.time()
+                async with self.condition:
+                    for order_id, status in statuses.items():
+                        if order_id in self.orders:
+                            self.statuses[order_id] = status
+                            self.updated[order_id] = now
+                            self.trader.ledgers[self.exchange].order_updated(status)
+                    self.condition.notify_all()
+                await asyncio.sleep(order_poll_period)
+        finally:
+            self.poller = None
+
+    async def wait_order(self, order_id, symbol, since=0.0):
+        self.track(order_id, symbol)
+        try:
+            async with self.condition:
+                await asyncio.wait_for(
+                    self.condition.wait_for(lambda: self.updated.get(order_id, 0.0) > since),
+                    order_status_timeout)
+        except asyncio.TimeoutError:
+            if self.error is not None:
+                raise self.error
+            raise
+        return self.statuses[order_id], self.updated[order_id]
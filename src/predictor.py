@@ -1,5 +1,4 @@
 import os
-import gc
 import time
 import joblib
 import pandas as pd
@@ -10,6 +9,7 @@ from sklearn.metrics import mean_absolute_error, median_absolute_error
 from datetime import datetime
 from threading import RLock, Thread
 
+from .metrics import timed
 from .util import PoolObject, yobit_err, form_traceback
 from .constants import predictor_main_cols, predictor_target_col, predictor_dataset, \
     predictor_dummy_cols, trained_model, learning_period
@@ -25,12 +25,15 @@ class Predictor(PoolObject):
         self.model = None
         self.model_date = None
         self.metrics = None
-        self.load_stuff()
 
         self.data = None
         self.train_data = None
         self.val_data = None
-        self.available = True
+
+        # the model loads in the background, the collector waits on availability before predicting
+        self.load_thread = PredictorLoadThread(self)
+        self.load_thread.setDaemon(True)
+        self.load_thread.start()
 
         print('predictor: started')
 
@@ -50,10 +53,24 @@ class Predictor(PoolObject):
                 report += '        * {0}: {1:.2f}\n'.format(k, v)
         return report
 
+    def get_memory_usage(self):
+        usage = {}
+        for name in ['data', 'train_data', 'val_data']:
+            frame = getattr(self, name)
+            usage[name + '_bytes'] = 0 if frame is None else int(frame.memory_usage(deep=True).sum())
+        # a forest pickles to about its in-memory size
+        model_file = os.path.join(trained_model, 'model')
+        usage['model_loaded'] = self.model is not None
+        usage['model_bytes'] = 0
+        if self.model is not None and os.path.isfile(model_file):
+            usage['model_bytes'] = os.path.getsize(model_file)
+        return usage
+
     def learn(self):
         self.read_and_prepare_data()
         self.train()
 
+    @timed('predictor_predict_seconds')
     def predict(self, signal):
         self.data = pd.DataFrame(signal, index=[0])
 
@@ -107,6 +124,7 @@ class Predictor(PoolObject):
             self.train_data = self.data.iloc[:val_start_index].reset_index(drop=True)
             self.val_data = self.data.iloc[val_start_index:val_end_index].reset_index(drop=True)
 
+    @timed('predictor_train_seconds')
     def train(self):
         train_data_use_cols = self.train_data[predictor_main_cols]
         val_data_use_cols = self.val_data[predictor_main_cols]
@@ -128,7 +146,6 @@ class Predictor(PoolObject):
 
         self.train_data = None
         self.val_data = None
-        gc.collect()
 
         self.pool['bot'].send(['Predictor: finished training for metrics'])
 
@@ -149,7 +166,6 @@ class Predictor(PoolObject):
         self.model = None
         self.dummies = None
         self.data = None
-        gc.collect()
 
         self.pool['bot'].send(['Predictor: finished training for real'])
 
@@ -223,25 +239,41 @@ class Predictor(PoolObject):
         return metrics
 
 
+class PredictorLoadThread(Thread):
+    def __init__(self, predictor):
+        Thread.__init__(self)
+        self.predictor = predictor
+
+    def run(self):
+        start = time.time()
+        try:
+            self.predictor.load_stuff()
+            print('predictor: model loaded in {0:.2f}s'.format(time.time() - start))
+        except Exception as exc:
+            print('predictor: failed to load model: {0}'.format(form_traceback(exc)))
+        self.predictor.available = True
+
+
 class PredictorLearnThread(Thread):
-    def __init__(self, predictor, client, bot):
+    def __init__(self, predictor, client, bot, jobs):
         Thread.__init__(self)
         self.predictor = predictor
         self.client = client
         self.bot = bot
+        self.jobs = jobs
 
     def run(self):
         while True:
             try:
                 self.bot.send(['Updating dataset...'])
-                self.client.update_dataset()
+                self.jobs.submit('update_dataset', self.client.update_dataset)[0].result()
                 self.bot.send(['Dataset updated'])
 
                 self.bot.send(['Completing dataset...'])
-                self.client.complete_dataset()
+                self.jobs.submit('complete_dataset', self.client.complete_dataset)[0].result()
                 self.bot.send(['Dataset completed'])
 
-                self.predictor.learn()
+                self.jobs.submit('learn', lambda job: self.predictor.learn())[0].result()
             except Exception as exc:
                 self.bot.send(['Something wrong happened:', form_traceback(exc)])
             time.sleep(learning_period)
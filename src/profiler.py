@@ -0,0 +1,197 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+import tracemalloc
+import concurrent.futures
+
+from threading import Thread, Lock, Event
+from os.path import join, basename, dirname
+
+from .util import PoolObject
+from .constants import profiles, profiler_components, profiler_sample_period, profiler_max_duration, \
+    profiler_stacks_timeout, profiler_summary_rows
+
+src_dir = dirname(os.path.abspath(__file__))
+
+
+class SamplingProfilerThread(Thread):
+    def __init__(self, component):
+        Thread.__init__(self)
+        self.component = component
+        self.modules = profiler_components.get(component)
+        self.samples = {}
+        self.count = 0
+        self.started = time.time()
+        self.finished = None
+        self.stopped = Event()
+
+    def run(self):
+        # cProfile only sees the thread that enabled it, sampling every thread's frame covers the whole process
+        own_id = threading.get_ident()
+        while not self.stopped.wait(profiler_sample_period):
+            if time.time() - self.started > profiler_max_duration:
+                break
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append((frame.f_code.co_filename, frame.f_code.co_name))
+                    frame = frame.f_back
+                if self.modules is not None and not any(
+                        dirname(filename) == src_dir and basename(filename) in self.modules for filename, _ in stack):
+                    continue
+                stack = tuple(reversed(stack))
+                self.samples[stack] = self.samples.get(stack, 0) + 1
+                self.count += 1
+        self.finished = time.time()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Profiler(PoolObject):
+    def __init__(self):
+        PoolObject.__init__(self)
+
+        self.lock = Lock()
+        self.sampler = None
+        self.snapshot = None
+        self.available = True
+
+    @staticmethod
+    def make_filename(kind):
+        if not os.path.exists(profiles):
+            os.makedirs(profiles)
+        return join(profiles, '{0}_{1}.txt'.format(kind, time.strftime('%Y%m%d_%H%M%S')))
+
+    @staticmethod
+    def frame_name(frame):
+        filename, function = frame
+        return '{0}:{1}'.format(basename(filename), function)
+
+    def start_sampling(self, component='all'):
+        with self.lock:
+            if self.sampler is not None:
+                return False
+            self.sampler = SamplingProfilerThread(component)
+            self.sampler.setDaemon(True)
+            self.sampler.start()
+            return True
+
+    def stop_sampling(self):
+        with self.lock:
+            sampler = self.sampler
+            self.sampler = None
+        if sampler is None:
+            return None
+        sampler.stop()
+
+        self_counts = {}
+        total_counts = {}
+        for stack, count in sampler.samples.items():
+            top = self.frame_name(stack[-1])
+            self_counts[top] = self_counts.get(top, 0) + count
+            # inclusive counts only for our own code, library frames would drown it
+            for name in set(self.frame_name(frame) for frame in stack if dirname(frame[0]) == src_dir):
+                total_counts[name] = total_counts.get(name, 0) + count
+
+        filename = self.make_filename('profile')
+        with open(filename, 'w') as file:
+            # collapsed stacks, ready for flamegraph tools
+            for stack, count in sorted(sampler.samples.items(), key=lambda item: -item[1]):
+                file.write('{0} {1}\n'.format(';'.join(self.frame_name(frame) for frame in stack), count))
+
+        summary = '    - Component: {0}\n'.format(sampler.component)
+        summary += '    - Duration: {0:.0f}s, {1} samples\n'.format(sampler.finished - sampler.started, sampler.count)
+        summary += '    - Saved to: {0}\n'.format(filename)
+        for title, counts in [('Top own code (inclusive)', total_counts), ('Top functions (self)', self_counts)]:
+            summary += '    - {0}:\n'.format(title)
+            for name, count in sorted(counts.items(), key=lambda item: -item[1])[:profiler_summary_rows]:
+                summary += '        * {0}: {1:.1f}%\n'.format(name, count / max(sampler.count, 1) * 100)
+        return summary
+
+    @staticmethod
+    async def trade_stacks(trader):
+        stacks = []
+        for trade in trader.registry.get_active():
+            if trade.task is None:
+                continue
+            # get_stack() gives only the outermost frame of a suspended task, the await chain shows where it is stuck
+            frames = []
+            coro = trade.task.get_coro()
+            while coro is not None:
+                frame = getattr(coro, 'cr_frame', None) or getattr(coro, 'gi_frame', None)
+                if frame is not None:
+                    frames.append(frame)
+                coro = getattr(coro, 'cr_await', None) or getattr(coro, 'gi_yieldfrom', None)
+            lines = traceback.format_list(traceback.StackSummary.extract((f, f.f_lineno) for f in frames))
+            stacks.append((trader.dump_key(trade.report), lines))
+        return stacks
+
+    def dump_stacks(self):
+        threads = {thread.ident: thread.name for thread in threading.enumerate()}
+        thread_stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            thread_stacks.append((threads.get(thread_id, str(thread_id)), traceback.format_stack(frame)))
+        trade_stacks = []
+        trades_note = None
+        if self.pool is not None and 'trader' in self.pool:
+            trader = self.pool['trader']
+            future = asyncio.run_coroutine_threadsafe(self.trade_stacks(trader), trader.loop)
+            try:
+                trade_stacks = future.result(profiler_stacks_timeout)
+            except concurrent.futures.TimeoutError:
+                # a blocked loop is exactly when the thread stacks matter, so they are still saved
+                future.cancel()
+                trades_note = 'trader loop did not respond in {0}s'.format(profiler_stacks_timeout)
+
+        filename = self.make_filename('stacks')
+        with open(filename, 'w') as file:
+            for title, stacks in [('Thread', thread_stacks), ('Trade', trade_stacks)]:
+                for name, lines in stacks:
+                    file.write('{0} {1}:\n{2}\n'.format(title, name, ''.join(lines)))
+            if trades_note is not None:
+                file.write('Trade stacks unavailable: {0}\n'.format(trades_note))
+
+        summary = '    - Threads: {0}, trades: {1}\n'.format(
+            len(thread_stacks),
+            len(trade_stacks) if trades_note is None else 'unavailable ({0})'.format(trades_note))
+        summary += '    - Saved to: {0}\n'.format(filename)
+        for name, lines in thread_stacks:
+            summary += '        * {0}: {1}\n'.format(name, lines[-1].strip().split('\n')[0] if len(lines) > 0 else '-')
+        return summary
+
+    def memory_snapshot(self):
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.snapshot = tracemalloc.take_snapshot()
+                return '    - Started tracing allocations, send the command again to diff against this point\n'
+            previous = self.snapshot
+            self.snapshot = tracemalloc.take_snapshot()
+            stats = self.snapshot.compare_to(previous, 'lineno')
+
+        filename = self.make_filename('memory')
+        with open(filename, 'w') as file:
+            for stat in stats:
+                file.write(str(stat) + '\n')
+        current, peak = tracemalloc.get_traced_memory()
+        summary = '    - Traced: {0:.1f} MB now, {1:.1f} MB peak\n'.format(current / 2 ** 20, peak / 2 ** 20)
+        summary += '    - Saved to: {0}\n'.format(filename)
+        summary += '    - Top growth since the last snapshot:\n'
+        for stat in stats[:profiler_summary_rows]:
+            summary += '        * {0}\n'.format(stat)
+        return summary
+
+    def stop_memory_tracing(self):
+        with self.lock:
+            if not tracemalloc.is_tracing():
+                return False
+            tracemalloc.stop()
+            self.snapshot = None
+            return True
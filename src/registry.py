@@ -0,0 +1,56 @@
+import time
+
+from threading import Lock
+from collections import deque
+
+from .metrics import registry
+from .constants import finished_trades_history
+
+
+class TradeRegistry:
+    def __init__(self, history=finished_trades_history):
+        self.lock = Lock()
+        self.active = {}
+        self.finished = deque(maxlen=history)
+        self.started_count = 0
+        self.finished_count = 0
+
+    def add(self, key, trade):
+        with self.lock:
+            self.active[key] = trade
+            self.started_count += 1
+            registry.gauge('trader_active_trades').set(len(self.active))
+
+    def finish(self, key, trade):
+        with self.lock:
+            # a restored trade may have replaced the one that is finishing under the same key
+            if self.active.get(key) is trade:
+                del self.active[key]
+            self.finished.append((time.time(), dict(trade.report)))
+            self.finished_count += 1
+            registry.gauge('trader_active_trades').set(len(self.active))
+            registry.counter('trader_finished_trades_total').inc()
+
+    def is_active(self, key):
+        with self.lock:
+            return key in self.active
+
+    def count_active(self):
+        with self.lock:
+            return len(self.active)
+
+    def get_active(self):
+        with self.lock:
+            return list(self.active.values())
+
+    def get_finished(self):
+        with self.lock:
+            return list(self.finished)
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'active': len(self.active),
+                'started': self.started_count,
+                'finished': self.finished_count
+            }
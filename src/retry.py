@@ -0,0 +1,90 @@
+import time
+import random
+import asyncio
+import ccxt
+
+from .constants import retry_base_delay, retry_max_delay, breaker_failure_threshold, breaker_reset_period
+
+
+def is_transient(exc):
+    # network errors may go away, an exchange rejecting the request or a bug on our side will not
+    return isinstance(exc, ccxt.NetworkError)
+
+
+def backoff(attempt):
+    delay = min(retry_max_delay, retry_base_delay * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_at = 0.0
+        self.trips = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.last_error = None
+
+    async def acquire(self):
+        while True:
+            now = time.time()
+            if self.state == 'closed':
+                return
+            # one call probes the exchange after the reset period, the rest wait for its outcome
+            if now >= max(self.opened_at, self.probe_at) + breaker_reset_period:
+                self.state = 'half-open'
+                self.probe_at = now
+                return
+            await asyncio.sleep(max(max(self.opened_at, self.probe_at) + breaker_reset_period - now, retry_base_delay))
+
+    def success(self):
+        self.state = 'closed'
+        self.failures = 0
+
+    def failure(self, exc):
+        self.failures += 1
+        self.last_error = repr(exc)
+        if self.state == 'half-open' or (self.state == 'closed' and self.failures >= breaker_failure_threshold):
+            self.state = 'open'
+            self.opened_at = time.time()
+            self.trips += 1
+
+    def get_stats(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips,
+            'retries': self.retries,
+            'gave_up': self.gave_up,
+            'last_error': self.last_error
+        }
+
+
+async def retry(breaker, tries, func, *args, **kwargs):
+    attempt = 0
+    while True:
+        if breaker is not None:
+            await breaker.acquire()
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as exc:
+            transient = is_transient(exc)
+            if breaker is not None:
+                if transient:
+                    breaker.failure(exc)
+                else:
+                    breaker.success()
+            if not transient or attempt >= tries:
+                if transient and breaker is not None:
+                    breaker.gave_up += 1
+                raise
+            attempt += 1
+            if breaker is not None:
+                breaker.retries += 1
+            await asyncio.sleep(backoff(attempt))
+            continue
+        if breaker is not None:
+            breaker.success()
+        return result
@@ -1,18 +1,40 @@
+import io
+import os
 import csv
+import time
+import atexit
 import os.path
 
-from .util import PoolObject
-from .constants import scribe_finished_trades, report_cols, scribe_ignored_signals, scribe_approved_signals
+from queue import Queue, Empty
+from threading import Thread
+
+from .util import PoolObject, form_traceback
+from .analytics import Analytics
+from .metrics import registry, timed
+from .constants import scribe_finished_trades, report_cols, scribe_ignored_signals, scribe_approved_signals, \
+    scribe_read_block, scribe_flush_period, scribe_flush_records
 
 
 class Scribe(PoolObject):
     def __init__(self):
         PoolObject.__init__(self)
 
+        self.writer = ScribeWriterThread(self)
+        self.writer.setDaemon(True)
+        self.writer.start()
+        atexit.register(self.writer.stop)
+        self.analytics = Analytics()
         self.available = True
 
         print('scribe: started')
 
+    def get_memory_usage(self):
+        return {
+            'writer_queue': self.writer.queue.qsize(),
+            'analytics_rows': sum(table.rows for table in [
+                self.analytics.trades, self.analytics.approved, self.analytics.ignored])
+        }
+
     @staticmethod
     def get_report():
         count_of_signals = 3
@@ -33,34 +55,131 @@ class Scribe(PoolObject):
             report += '\n'
         return report
 
-    @staticmethod
-    def ignored(signal):
-        Scribe.write_to_csv(scribe_ignored_signals, signal)
+    def ignored(self, signal):
+        self.writer.put(scribe_ignored_signals, signal)
 
-    @staticmethod
-    def approved(signal):
-        Scribe.write_to_csv(scribe_approved_signals, signal)
+    def approved(self, signal):
+        self.writer.put(scribe_approved_signals, signal)
 
-    @staticmethod
-    def trade(signal):
-        Scribe.write_to_csv(scribe_finished_trades, signal)
+    def trade(self, signal):
+        self.writer.put(scribe_finished_trades, signal)
 
     @staticmethod
-    def write_to_csv(filename, signal):
-        write_header = not os.path.isfile(filename)
-        with open(filename, 'w' if write_header else 'a', newline='') as file:
-            columns = signal.keys()
-            writer = csv.DictWriter(file, fieldnames=columns)
-            if write_header:
-                writer.writeheader()
-            writer.writerow(signal)
+    def read_from_csv(filename, count_of_signals):
+        if not os.path.isfile(filename):
+            return []
+        # seek back from the end until enough lines are read instead of parsing the whole history
+        with open(filename, 'rb') as file:
+            header = file.readline()
+            start = file.tell()
+            file.seek(0, os.SEEK_END)
+            position = file.tell()
+            tail = b''
+            while position > start and tail.count(b'\n') <= count_of_signals:
+                step = min(scribe_read_block, position - start)
+                position -= step
+                file.seek(position)
+                tail = file.read(step) + tail
+        lines = tail.split(b'\n')[:-1]
+        if position > start:
+            lines = lines[1:]
+        lines = lines[-count_of_signals:] if count_of_signals > 0 else []
+        text = (header + b''.join(line + b'\n' for line in lines)).decode()
+        return list(csv.DictReader(io.StringIO(text, newline='')))
+
+
+class ScribeWriterThread(Thread):
+    def __init__(self, scribe):
+        Thread.__init__(self)
+        self.scribe = scribe
+        self.queue = Queue()
+        self.files = {}
+        self.pending = 0
+        self.flushed = time.time()
+
+    def put(self, filename, record):
+        # callers keep mutating their dicts after handing them over
+        self.queue.put((filename, dict(record)))
+
+    def stop(self):
+        if self.is_alive():
+            self.queue.put(None)
+            self.join()
+
+    def run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=scribe_flush_period)
+            except Empty:
+                item = ()
+            if item is None:
+                break
+            registry.gauge('scribe_queue_size').set(self.queue.qsize())
+            try:
+                if item:
+                    self.write(*item)
+                if self.pending >= scribe_flush_records or \
+                        (self.pending > 0 and time.time() - self.flushed >= scribe_flush_period):
+                    self.flush()
+            except Exception as exc:
+                self.close()
+                self.report(exc)
+        try:
+            self.flush()
+        finally:
+            self.close()
+
+    def report(self, exc):
+        if self.scribe.pool is not None:
+            self.scribe.pool['bot'].send(['Something wrong happened during writing scribe logs:', form_traceback(exc)])
 
     @staticmethod
-    def read_from_csv(filename, count_of_signals):
-        signals = []
+    def open_file(filename):
+        directory = os.path.dirname(filename)
+        if directory != '' and not os.path.exists(directory):
+            os.makedirs(directory)
+        columns = []
         if os.path.isfile(filename):
             with open(filename, 'r', newline='') as file:
-                rows = list(csv.DictReader(file))[-count_of_signals:]
-                for row in rows:
-                    signals.append(row)
-        return signals
+                columns = next(csv.reader(file), [])
+        return open(filename, 'a', newline=''), columns
+
+    @timed('scribe_write_seconds')
+    def write(self, filename, record):
+        if filename not in self.files:
+            self.files[filename] = self.open_file(filename)
+        file, columns = self.files[filename]
+        if len(columns) == 0:
+            columns.extend(record.keys())
+            csv.DictWriter(file, fieldnames=columns).writeheader()
+        new_columns = [k for k in record if k not in columns]
+        if len(new_columns) > 0:
+            self.migrate(filename, columns + new_columns)
+            file, columns = self.files[filename]
+        csv.DictWriter(file, fieldnames=columns, restval='').writerow(record)
+        self.pending += 1
+
+    def migrate(self, filename, columns):
+        # signals gained new keys, rewrite the file once under the wider header so every row lines up
+        file, _ = self.files.pop(filename)
+        file.close()
+        tmp_filename = filename + '.tmp'
+        with open(filename, 'r', newline='') as src, open(tmp_filename, 'w', newline='') as dst:
+            writer = csv.DictWriter(dst, fieldnames=columns, restval='', extrasaction='ignore')
+            writer.writeheader()
+            for row in csv.DictReader(src):
+                writer.writerow(row)
+        os.replace(tmp_filename, filename)
+        self.files[filename] = (open(filename, 'a', newline=''), columns)
+
+    @timed('scribe_flush_seconds')
+    def flush(self):
+        for file, _ in self.files.values():
+            file.flush()
+        self.pending = 0
+        self.flushed = time.time()
+
+    def close(self):
+        for file, _ in self.files.values():
+            file.close()
+        self.files = {}
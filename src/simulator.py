@@ -0,0 +1,214 @@
+import math
+import time
+import random
+import ccxt
+
+
+class SimulatedExchange:
+    def __init__(self, symbols, rate_limit=5, fill_latency=1.0, error_rate=0.0, drift=0.0002, volatility=0.0003,
+                 spread=0.002, start_price=0.0001, balance=1000.0, price_path=None, seed=None):
+        self.rateLimit = rate_limit
+        self.fill_latency = fill_latency
+        self.error_rate = error_rate
+        self.drift = drift
+        self.volatility = volatility
+        self.spread = spread
+        self.price_path = price_path
+        self.random = random.Random(seed)
+        self.has = {
+            'fetchTickers': True,
+            'fetchOpenOrders': True,
+            'fetchClosedOrders': True,
+            'fetchL2OrderBook': True
+        }
+
+        self.started = time.time()
+        self.prices = {symbol: (self.started, start_price) for symbol in symbols}
+        self.markets = {}
+        self.currencies = {}
+        self.free = {'BTC': balance}
+        self.used = {'BTC': 0.0}
+        self.orders = {}
+        self.open_orders = set()
+        self.next_order_id = 0
+
+        self.calls = {}
+        self.throttled = 0
+        self.injected_errors = 0
+        self.last_call = 0.0
+
+    def request(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        now = time.time()
+        # a little tolerance for timer jitter, a real exchange is less strict than its documented limit
+        too_fast = now - self.last_call < self.rateLimit / 1000.0 * 0.9
+        self.last_call = now
+        if too_fast:
+            self.throttled += 1
+            raise ccxt.RateLimitExceeded('simulated: rate limit exceeded on ' + method)
+        if self.random.random() < self.error_rate:
+            self.injected_errors += 1
+            raise ccxt.NetworkError('simulated: injected error on ' + method)
+        self.match_orders(now)
+
+    def price(self, symbol, now=None):
+        now = time.time() if now is None else now
+        if self.price_path is not None:
+            return self.price_path(symbol, now - self.started)
+        last_time, last_price = self.prices[symbol]
+        dt = now - last_time
+        if dt > 0:
+            step = self.drift * dt + self.volatility * math.sqrt(dt) * self.random.gauss(0, 1)
+            last_price *= math.exp(step)
+            self.prices[symbol] = (now, last_price)
+        return last_price
+
+    def ticker(self, symbol, now=None):
+        last = self.price(symbol, now)
+        return {
+            'symbol': symbol,
+            'last': last,
+            'bid': last * (1 - self.spread / 2),
+            'ask': last * (1 + self.spread / 2)
+        }
+
+    def match_orders(self, now):
+        for order_id in list(self.open_orders):
+            order = self.orders[order_id]
+            if now - order['timestamp'] / 1000.0 < self.fill_latency:
+                continue
+            ticker = self.ticker(order['symbol'], now)
+            # liquidity is assumed to sit at the mid price, so anything at or through it fills
+            if not order['marketable'] and order['side'] == 'buy' and ticker['last'] > order['price']:
+                continue
+            if not order['marketable'] and order['side'] == 'sell' and ticker['last'] < order['price']:
+                continue
+            base, quote = order['symbol'].split('/')
+            if order['side'] == 'buy':
+                self.used[quote] -= order['amount'] * order['price']
+                self.free[base] = self.free.get(base, 0.0) + order['amount']
+            else:
+                self.used[base] -= order['amount']
+                self.free[quote] = self.free.get(quote, 0.0) + order['amount'] * order['price']
+            self.open_orders.discard(order_id)
+            order['status'] = 'closed'
+            order['filled'] = order['amount']
+            order['remaining'] = 0.0
+            order['cost'] = order['amount'] * order['price']
+
+    @staticmethod
+    def public(order):
+        return {k: v for k, v in order.items() if k != 'marketable'}
+
+    async def load_markets(self, reload=False, params={}):
+        self.request('load_markets')
+        self.markets = {
+            symbol: {'symbol': symbol, 'precision': {'amount': 8, 'price': 8}} for symbol in self.prices}
+        return self.markets
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        self.currencies = currencies or {}
+
+    def amount_to_precision(self, symbol, amount):
+        return '{0:.8f}'.format(math.floor(float(amount) * 1e8) / 1e8)
+
+    async def fetch_ticker(self, symbol, params={}):
+        self.request('fetch_ticker')
+        return self.ticker(symbol)
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        self.request('fetch_tickers')
+        return {symbol: self.ticker(symbol) for symbol in (symbols or self.prices)}
+
+    async def fetch_l2_order_book(self, symbol, limit=None, params={}):
+        self.request('fetch_l2_order_book')
+        ticker = self.ticker(symbol)
+        levels = limit or 20
+        return {
+            'symbol': symbol,
+            'bids': [[ticker['bid'] * (1 - 0.001 * i), 1000.0 * (i + 1)] for i in range(levels)],
+            'asks': [[ticker['ask'] * (1 + 0.001 * i), 1000.0 * (i + 1)] for i in range(levels)]
+        }
+
+    async def fetch_balance(self, params={}):
+        self.request('fetch_balance')
+        total = {k: self.free.get(k, 0.0) + self.used.get(k, 0.0) for k in set(self.free) | set(self.used)}
+        return {'free': dict(self.free), 'used': dict(self.used), 'total': total}
+
+    async def create_order(self, symbol, type, side, amount, price=None, params={}):
+        self.request('create_order')
+        amount = float(amount)
+        price = float(price)
+        base, quote = symbol.split('/')
+        if side == 'buy':
+            currency, cost = quote, amount * price
+        else:
+            currency, cost = base, amount
+        if amount <= 0 or self.free.get(currency, 0.0) < cost:
+            raise ccxt.InsufficientFunds('simulated: not enough ' + currency)
+        self.free[currency] -= cost
+        self.used[currency] = self.used.get(currency, 0.0) + cost
+        self.next_order_id += 1
+        order = {
+            'id': str(self.next_order_id),
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'amount': amount,
+            'price': price,
+            'filled': 0.0,
+            'remaining': amount,
+            'cost': 0.0,
+            'status': 'open',
+            'timestamp': int(time.time() * 1000),
+            'fee': None
+        }
+        ticker = self.ticker(symbol)
+        marketable = price >= ticker['ask'] if side == 'buy' else price <= ticker['bid']
+        self.orders[order['id']] = dict(order, marketable=marketable)
+        self.open_orders.add(order['id'])
+        return order
+
+    async def cancel_order(self, id, symbol=None, params={}):
+        self.request('cancel_order')
+        order = self.orders.get(id)
+        if order is None or order['status'] != 'open':
+            raise ccxt.OrderNotFound('simulated: order ' + str(id) + ' is not open')
+        base, quote = order['symbol'].split('/')
+        if order['side'] == 'buy':
+            self.used[quote] -= order['amount'] * order['price']
+            self.free[quote] += order['amount'] * order['price']
+        else:
+            self.used[base] -= order['amount']
+            self.free[base] += order['amount']
+        self.open_orders.discard(id)
+        order['status'] = 'canceled'
+        return self.public(order)
+
+    async def fetch_order(self, id, symbol=None, params={}):
+        self.request('fetch_order')
+        if id not in self.orders:
+            raise ccxt.OrderNotFound('simulated: order ' + str(id) + ' not found')
+        return self.public(self.orders[id])
+
+    def list_orders(self, open_orders, symbol, since):
+        orders = [self.orders[order_id] for order_id in self.open_orders] if open_orders else \
+            [order for order in self.orders.values() if order['status'] != 'open']
+        return [self.public(order) for order in orders
+                if (symbol is None or order['symbol'] == symbol) and
+                (since is None or order['timestamp'] >= since)]
+
+    async def fetch_open_orders(self, symbol=None, since=None, limit=None, params={}):
+        self.request('fetch_open_orders')
+        return self.list_orders(True, symbol, since)
+
+    async def fetch_closed_orders(self, symbol=None, since=None, limit=None, params={}):
+        self.request('fetch_closed_orders')
+        return self.list_orders(False, symbol, since)
+
+    async def close(self):
+        pass
+
+    def get_calls(self):
+        return sum(self.calls.values())
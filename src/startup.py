@@ -0,0 +1,74 @@
+import time
+
+from threading import Thread
+
+from .metrics import registry
+from .util import form_traceback
+
+
+class ComponentStartThread(Thread):
+    def __init__(self, component, factory):
+        Thread.__init__(self)
+        self.component = component
+        self.factory = factory
+        self.entity = None
+        self.exception = None
+        self.elapsed = None
+
+    def run(self):
+        start = time.time()
+        try:
+            self.entity = self.factory()
+        except Exception as exc:
+            self.exception = exc
+        self.elapsed = time.time() - start
+
+
+class ReadinessThread(Thread):
+    def __init__(self, component, entity, started):
+        Thread.__init__(self)
+        self.component = component
+        self.entity = entity
+        self.started = started
+
+    def run(self):
+        self.entity.wait_available()
+        elapsed = time.time() - self.started
+        registry.gauge('startup_ready_seconds', component=self.component).set(elapsed)
+        print('startup: {0} available after {1:.2f}s'.format(self.component, elapsed))
+
+
+def start_pool(factories):
+    # components do not touch the pool while constructing, so they can all come up at once
+    started = time.time()
+    threads = [ComponentStartThread(component, factory) for component, factory in factories.items()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    failed = [thread for thread in threads if thread.exception is not None]
+    for thread in failed:
+        print('startup: {0} failed after {1:.2f}s:\n{2}'.format(
+            thread.component,
+            thread.elapsed,
+            form_traceback(thread.exception)))
+    if len(failed) > 0:
+        raise failed[0].exception
+
+    pool = {}
+    for thread in threads:
+        pool[thread.component] = thread.entity
+        registry.gauge('startup_seconds', component=thread.component).set(thread.elapsed)
+        print('startup: {0} constructed in {1:.2f}s'.format(thread.component, thread.elapsed))
+    for _, entity in pool.items():
+        entity.set_pool(pool)
+    print('startup: pool constructed in {0:.2f}s'.format(time.time() - started))
+
+    for component, entity in pool.items():
+        if entity.available:
+            continue
+        readiness_thread = ReadinessThread(component, entity, started)
+        readiness_thread.setDaemon(True)
+        readiness_thread.start()
+    return pool
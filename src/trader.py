@@ -1,34 +1,70 @@
 import os
 import json
 import time
-import ccxt
+import asyncio
+import ccxt.async_support as ccxt
 
 from xml.etree import ElementTree
 from threading import RLock, Thread
 from os.path import join
 
+from .metrics import registry
 from .util import PoolObject, get_btc_price, form_traceback
+from .limiter import RateLimiter
+from .market import MarketHub, MarketsCache
+from .orders import OrderTracker
+from .ledger import BalanceLedger
+from .journal import TradeJournal
+from .allocator import CapitalAllocator
+from .execution import price_from_book
+from .retry import CircuitBreaker, retry
+from .registry import TradeRegistry
 from .constants import allowed_exchanges, trader_config, report_cols, trader_dumps, \
-    trade_amount_per_thread, trade_time_period, exchanges_fees, max_tries_to_call_api, \
-    pending_order_time, max_price_decrease, thread_cleaning_period
+    exchange_client_ids, exchange_client_options, trade_amount_per_thread, trade_time_period, \
+    exchanges_fees, \
+    pending_order_time, max_price_decrease, market_quote_max_age, \
+    market_poll_period, fast_entry, report_exchange_timeout, report_ticker_timeout, trader_journal, \
+    journal_sync_period, \
+    markets_cache, trade_slots_per_exchange, trade_budget_per_exchange, exchanges_trade_slots, \
+    exchanges_trade_budget, order_book_pricing, order_book_depth, order_book_tolerance, finished_trades_reported, \
+    max_tries_to_call_api, non_retryable_methods
 
 lock = RLock()
 
 
 class Trader(PoolObject):
-    def __init__(self):
+    def __init__(self, clients=None, journal_filename=trader_journal, markets_dir=markets_cache):
         PoolObject.__init__(self)
 
         self.exchanges = {}
-        self.threads = []
+        self.limiters = {}
+        self.breakers = {}
+        self.markets = {}
+        self.orders = {}
+        self.ledgers = {}
+        self.markets_caches = {}
+        self.registry = TradeRegistry()
         self.free_balances = {}
         self.used_balances = {}
-        self.locks = {}
-        for ex in allowed_exchanges:
-            self.locks[ex] = False
+        self.balances_report = None
+        self.balances_refresh = None
+        self.allocators = {}
 
-        self.meta = self.parse_xml()
-        self.setup_clients()
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = TraderLoopThread(self.loop)
+        self.loop_thread.setDaemon(True)
+        self.loop_thread.start()
+
+        self.journal = TradeJournal(journal_filename)
+        asyncio.run_coroutine_threadsafe(self.sync_journal(), self.loop)
+
+        if clients is None:
+            self.meta = self.parse_xml()
+            self.setup_clients()
+        else:
+            self.meta = {}
+            self.exchanges.update(clients)
+        self.setup_exchanges(markets_dir)
         self.available = True
 
         print('trader: started')
@@ -46,97 +82,188 @@ class Trader(PoolObject):
         return meta
 
     def setup_clients(self):
-        self.exchanges['Bittrex'] = ccxt.bittrex({
-            'apiKey': self.meta['Bittrex']['public'],
-            'secret': self.meta['Bittrex']['secret'],
-        })
-        self.exchanges['Poloniex'] = ccxt.poloniex({
-            'apiKey': self.meta['Poloniex']['public'],
-            'secret': self.meta['Poloniex']['secret'],
-        })
-        self.exchanges['YoBit'] = ccxt.yobit({
-            'apiKey': self.meta['YoBit']['public'],
-            'secret': self.meta['YoBit']['secret'],
-        })
-        self.exchanges['HitBTC'] = ccxt.hitbtc2({
-            'apiKey': self.meta['HitBTC']['public'],
-            'secret': self.meta['HitBTC']['secret'],
-        })
-        self.exchanges['Tidex'] = ccxt.tidex({
-            'apiKey': self.meta['Tidex']['public'],
-            'secret': self.meta['Tidex']['secret'],
-        })
-        self.exchanges['Binance'] = ccxt.binance({
-            'options': {'adjustForTimeDifference': True},
-            'apiKey': self.meta['Binance']['public'],
-            'secret': self.meta['Binance']['secret'],
-        })
-        self.exchanges['Bitfinex'] = ccxt.bitfinex({
-            'apiKey': self.meta['Bitfinex']['public'],
-            'secret': self.meta['Bitfinex']['secret'],
-        })
-
-    def fetch_balances(self):
+        for exchange in allowed_exchanges:
+            if exchange not in exchange_client_ids:
+                print('trader: no client for {0}, skipping'.format(exchange))
+                continue
+            config = {
+                'asyncio_loop': self.loop,
+                'enableRateLimit': False,
+                'apiKey': self.meta[exchange]['public'],
+                'secret': self.meta[exchange]['secret'],
+            }
+            if exchange in exchange_client_options:
+                config['options'] = exchange_client_options[exchange]
+            self.exchanges[exchange] = getattr(ccxt, exchange_client_ids[exchange])(config)
+
+    def setup_exchanges(self, markets_dir):
         for exchange, client in self.exchanges.items():
-            try:
-                balances = client.fetch_balance()
-                self.free_balances[exchange] = balances['free']
-                self.used_balances[exchange] = balances['used']
-                tickers_to_remove = []
-                for ticker, quantity in self.free_balances[exchange].items():
-                    if float(quantity) == 0 and ticker.lower() != 'btc':
-                        tickers_to_remove.append(ticker)
-                for ticker in tickers_to_remove:
-                    self.free_balances[exchange].pop(ticker, None)
-                tickers_to_remove = []
-
-                for ticker, quantity in self.used_balances[exchange].items():
-                    if float(quantity) == 0 and ticker.lower() != 'btc':
-                        tickers_to_remove.append(ticker)
-                for ticker in tickers_to_remove:
-                    self.used_balances[exchange].pop(ticker, None)
-            except Exception as exc:
-                self.pool['bot'].send(['Something wrong happened during fetching ' + exchange + ' balance:', str(exc)])
+            self.limiters[exchange] = RateLimiter(client.rateLimit)
+            self.breakers[exchange] = CircuitBreaker()
+            self.markets[exchange] = MarketHub(self, exchange)
+            self.orders[exchange] = OrderTracker(self, exchange)
+            self.ledgers[exchange] = BalanceLedger(self, exchange)
+            self.markets_caches[exchange] = MarketsCache(self, exchange, markets_dir)
+            self.allocators[exchange] = CapitalAllocator(
+                exchanges_trade_slots.get(exchange, trade_slots_per_exchange),
+                exchanges_trade_budget.get(exchange, trade_budget_per_exchange))
+            asyncio.run_coroutine_threadsafe(self.markets_caches[exchange].run(), self.loop)
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    async def api(self, exchange, method, *args, **kwargs):
+        tries = 0 if method in non_retryable_methods else max_tries_to_call_api
+        return await retry(self.breakers[exchange], tries, self.request, exchange, method, *args, **kwargs)
+
+    async def request(self, exchange, method, *args, **kwargs):
+        await self.limiters[exchange].acquire(method)
+        start = time.time()
+        try:
+            return await getattr(self.exchanges[exchange], method)(*args, **kwargs)
+        except Exception:
+            registry.counter('exchange_call_errors_total', exchange=exchange, method=method).inc()
+            raise
+        finally:
+            registry.histogram('exchange_call_seconds', exchange=exchange, method=method).observe(time.time() - start)
+
+    async def fetch_balances(self):
+        exchanges = list(self.exchanges)
+        results = await asyncio.gather(
+            *[asyncio.wait_for(self.ledgers[exchange].get_balances(), report_exchange_timeout)
+              for exchange in exchanges],
+            return_exceptions=True)
+        errors = {}
+        for exchange, balances in zip(exchanges, results):
+            if isinstance(balances, Exception):
+                errors[exchange] = balances
+                continue
+            self.free_balances[exchange] = {
+                ticker: quantity for ticker, quantity in balances['free'].items()
+                if float(quantity) != 0 or ticker.lower() == 'btc'}
+            self.used_balances[exchange] = {
+                ticker: quantity for ticker, quantity in balances['used'].items()
+                if float(quantity) != 0 or ticker.lower() == 'btc'}
+        return errors
+
+    async def value_balance(self, exchange, balance, btc_price, since):
+        markets = self.exchanges[exchange].markets
+        # coins without a BTC pair would never get a quote and only hold the report until the timeout
+        tickers = [ticker for ticker in balance
+                   if ticker != 'BTC' and (not markets or ticker + '/BTC' in markets)]
+        quotes = await asyncio.gather(
+            *[asyncio.wait_for(self.markets[exchange].wait_ticker(ticker + '/BTC', since), report_ticker_timeout)
+              for ticker in tickers],
+            return_exceptions=True)
+        ticker_prices = {'BTC': 1.0}
+        for ticker, quote in zip(tickers, quotes):
+            if not isinstance(quote, Exception):
+                ticker_prices[ticker] = quote[0]['last']
+        report = ''
+        for ticker, quantity in balance.items():
+            if ticker not in ticker_prices:
+                continue
+            dollars = float(quantity) * btc_price * ticker_prices[ticker]
+            if dollars < 0.01:
+                continue
+            report += '            > {0}: {1:.8f} ({2:.2f}$)\n'.format(ticker, quantity, dollars)
+        return report
+
+    async def build_balances_report(self):
+        errors = await self.fetch_balances()
+        btc_price = await self.loop.run_in_executor(None, get_btc_price)
+        since = time.time() - market_quote_max_age
+        report = ''
+        for category, balances in [('Free', self.free_balances), ('Used', self.used_balances)]:
+            exchanges = list(balances)
+            results = await asyncio.gather(
+                *[asyncio.wait_for(self.value_balance(exchange, balances[exchange], btc_price, since),
+                                   report_exchange_timeout)
+                  for exchange in exchanges],
+                return_exceptions=True)
+            report += '    - {0} balances:\n'.format(category)
+            for exchange, result in zip(exchanges, results):
+                report += '        * {0}:\n'.format(exchange)
+                if isinstance(result, Exception):
+                    report += '            > unable to value balance: {0}\n'.format(repr(result))
+                else:
+                    report += result
+        if len(errors) > 0:
+            report += '    - Unavailable exchanges:\n'
+            for exchange, exc in errors.items():
+                report += '        * {0}: {1}\n'.format(exchange, repr(exc))
+        self.balances_report = (time.time(), report)
+        return self.balances_report
+
+    def get_balances_report(self):
+        with lock:
+            snapshot = self.balances_report
+            if self.balances_refresh is None or self.balances_refresh.done():
+                self.balances_refresh = asyncio.run_coroutine_threadsafe(self.build_balances_report(), self.loop)
+            refresh = self.balances_refresh
+        if snapshot is None:
+            snapshot = refresh.result()
+        snapshot_time, report = snapshot
+        return '    - Balances snapshot age: {0:.0f}s\n'.format(time.time() - snapshot_time) + report
+
+    def get_memory_usage(self):
+        # the loop keeps changing live reports, a dict copy is taken in one step while serializing is not
+        active = [dict(trade.report) for trade in self.registry.get_active()]
+        finished = self.registry.get_finished()
+        return {
+            'active_trades': len(active),
+            'finished_trades': len(finished),
+            'trade_reports_bytes': sum(len(json.dumps(report)) for report in active) +
+            sum(len(json.dumps(report)) for _, report in finished),
+            'journal_states': len(self.journal.states)
+        }
 
     def get_report(self):
-        self.fetch_balances()
-        report = '    - Free balances:\n'
-        for exchange, balance in self.free_balances.items():
-            report += '        * {0}:\n'.format(exchange)
-            for ticker, quantity in balance.items():
-                price = get_btc_price()
-                dollars = float(quantity) * price
-                if ticker != 'BTC':
-                    try:
-                        ticker_price = self.exchanges[exchange].fetch_ticker(ticker + '/BTC')['last']
-                    except Exception:
-                        continue
-                    dollars *= ticker_price
-                if dollars < 0.01:
-                    continue
-                report += '            > {0}: {1:.8f} ({2:.2f}$)\n'.format(ticker, quantity, dollars)
-
-        report += '    - Used balances:\n'
-        for exchange, balance in self.used_balances.items():
-            report += '        * {0}:\n'.format(exchange)
-            for ticker, quantity in balance.items():
-                price = get_btc_price()
-                dollars = float(quantity) * price
-                if ticker != 'BTC':
-                    try:
-                        ticker_price = self.exchanges[exchange].fetch_ticker(ticker + '/BTC')['last']
-                    except Exception:
-                        continue
-                    dollars *= ticker_price
-                if dollars < 0.01:
-                    continue
-                report += '            > {0}: {1:.8f} ({2:.2f}$)\n'.format(ticker, quantity, dollars)
+        report = self.get_balances_report()
 
-        report += '    - Current trades:\n'
-        for thread in self.threads:
-            if not thread.is_alive():
+        report += '    - Rate limiters:\n'
+        for exchange, limiter in self.limiters.items():
+            stats = limiter.get_stats()
+            if stats['calls'] == 0:
                 continue
-            for k, v in thread.report.items():
+            report += '        * {0}: {1} calls, {2:.2f}s avg queue, {3:.2f}s max queue\n'.format(
+                exchange,
+                stats['calls'],
+                stats['avg_queue_secs'],
+                stats['max_queue_secs'])
+
+        report += '    - Exchange health:\n'
+        for exchange, breaker in self.breakers.items():
+            stats = breaker.get_stats()
+            report += '        * {0}: {1}, {2} failures in a row, {3} trips, {4} retries, {5} gave up\n'.format(
+                exchange,
+                stats['state'],
+                stats['failures'],
+                stats['trips'],
+                stats['retries'],
+                stats['gave_up'])
+            if stats['last_error'] is not None and stats['state'] != 'closed':
+                report += '            > last error: {0}\n'.format(stats['last_error'])
+
+        report += '    - Capital allocation:\n'
+        for exchange, allocator in self.allocators.items():
+            stats = allocator.get_stats()
+            report += '        * {0}: {1}/{2} slots, {3:.8f}/{4:.8f} BTC\n'.format(
+                exchange,
+                stats['used_slots'],
+                stats['slots'],
+                stats['used_budget'],
+                stats['budget'])
+
+        stats = self.registry.get_stats()
+        report += '    - Trades: {0} active, {1} started, {2} finished\n'.format(
+            stats['active'],
+            stats['started'],
+            stats['finished'])
+
+        report += '    - Current trades:\n'
+        for trade in self.registry.get_active():
+            for k, v in trade.report.items():
                 if k not in report_cols or v is None:
                     continue
                 if k == 'signal_price' or ((k == 'buy_price' or k == 'sell_price') and v is not None):
@@ -144,57 +271,113 @@ class Trader(PoolObject):
                 else:
                     report += '        * {0}: {1}\n'.format(k, v)
             report += '\n'
+
+        finished = self.registry.get_finished()[-finished_trades_reported:]
+        if len(finished) > 0:
+            report += '    - Recently finished trades:\n'
+        for finished_time, trade_report in reversed(finished):
+            report += '        * {0} on {1}, {2:.0f}s ago: {3}\n'.format(
+                trade_report['symbol'],
+                trade_report['exchange'],
+                time.time() - finished_time,
+                trade_report['cancel_reason'] or trade_report['sell_reason'] or 'interrupted')
         return report
 
-    def make_trade(self, signal=None, report=None):
+    @staticmethod
+    def signal_key(signal):
+        return signal['date'][:-9] + '_' + signal['ticker'] + '_' + signal['exchange']
+
+    def admit(self, signal):
+        # capital is reserved per ticker, not per signal, so a later signal can't trade the same coins twice
+        amount = trade_amount_per_thread / float(signal['bpi'])
+        return self.allocators[signal['exchange']].admit(signal['ticker'], amount)
+
+    def make_trade(self, signal=None, report=None, received=None):
         if signal is None:
             exchange = report['exchange']
+            ticker = report['symbol'][:-4]
+            key = self.dump_key(report)
+            amount = report['trade_amount_per_thread'] / float(report['bpi'])
         else:
             exchange = signal['exchange']
-        trader_thread = TraderThread(
+            ticker = signal['ticker']
+            key = self.signal_key(signal)
+            amount = trade_amount_per_thread / float(signal['bpi'])
+        # approved signals are already admitted, restored trades get their capital back unconditionally
+        self.allocators[exchange].admit(ticker, amount, force=True)
+        trade = TraderTask(
             self,
             self.pool['bot'],
             self.pool['scribe'],
             self.exchanges[exchange],
             signal,
-            report)
-        trader_thread.setDaemon(True)
-        trader_thread.start()
-        self.threads.append(trader_thread)
+            report,
+            received)
+        self.registry.add(key, trade)
+        trade.start(key)
 
-    def restore_threads(self):
+    @staticmethod
+    def dump_key(report):
+        return report['date'][:-9] + '_' + report['symbol'][:-4] + '_' + report['exchange']
+
+    def import_legacy_dumps(self):
         if not os.path.exists(trader_dumps):
-            os.makedirs(trader_dumps)
-        dumps_filenames = os.listdir(trader_dumps)
-        if len(dumps_filenames) == 0:
+            return
+        for filename in os.listdir(trader_dumps):
+            try:
+                with open(join(trader_dumps, filename), 'r') as file:
+                    report = json.load(file)
+                self.journal.record(self.dump_key(report), report)
+            except ValueError as exc:
+                self.pool['bot'].send(['Skipped broken trader dump ' + filename + ':', str(exc)])
+            os.remove(join(trader_dumps, filename))
+        self.journal.sync()
+
+    def restore_threads(self):
+        self.import_legacy_dumps()
+        reports = [report for key, report in self.journal.get_states().items() if not self.registry.is_active(key)]
+        if len(reports) == 0:
             return False
-        for filename in dumps_filenames:
-            with open(join(trader_dumps, filename), 'r') as file:
-                report = json.load(file)
+        for report in reports:
             self.make_trade(None, report)
         return True
 
     def dump_thread(self, report):
-        if not os.path.exists(trader_dumps):
-            os.makedirs(trader_dumps)
         try:
-            filename = report['date'][:-9] + '_' + report['symbol'][:-4] + '_' + report['exchange']
-            with open(join(trader_dumps, filename), 'w+') as file:
-                json.dump(report, file)
+            self.journal.record(self.dump_key(report), report)
         except Exception as exc:
             self.pool['bot'].send(['Something wrong happened during dumping thread:', str(exc)])
 
     def remove_thread_dump(self, report):
         try:
-            filename = report['date'][:-9] + '_' + report['symbol'][:-4] + '_' + report['exchange']
-            os.remove(join(trader_dumps, filename))
+            self.journal.remove(self.dump_key(report))
         except Exception as exc:
             self.pool['bot'].send(['Something wrong happened during removing the dump:', str(exc)])
 
+    async def sync_journal(self):
+        while True:
+            await asyncio.sleep(journal_sync_period)
+            try:
+                await self.loop.run_in_executor(None, self.journal.sync)
+            except Exception as exc:
+                await self.loop.run_in_executor(
+                    None,
+                    self.pool['bot'].send,
+                    ['Something wrong happened during syncing trader journal:', str(exc)])
+
 
-class TraderThread(Thread):
-    def __init__(self, trader, bot, scribe, client, signal=None, report=None):
+class TraderLoopThread(Thread):
+    def __init__(self, loop):
         Thread.__init__(self)
+        self.loop = loop
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+class TraderTask:
+    def __init__(self, trader, bot, scribe, client, signal=None, report=None, received=None):
         self.trader = trader
         self.bot = bot
         self.scribe = scribe
@@ -209,6 +392,9 @@ class TraderThread(Thread):
                 'bpi': signal['bpi'],
                 'trade_amount_per_thread': trade_amount_per_thread,
                 'time_to_trade_secs': trade_time_period,
+                'time_to_order_secs': None,
+                'order_attempts': 0,
+                'expected_slippage': None,
                 'estimated_profit': signal['estimated_profit'],
                 'buy_price': None,
                 'sell_price': None,
@@ -218,40 +404,63 @@ class TraderThread(Thread):
                 'cancel_reason': None,
                 'sell_reason': None,
                 'work_time_secs': 0,
-                'iteration_time_secs': client.rateLimit / 1000.0 + 0.1,
                 'placed_buy_order': False,
                 'bought': False,
                 'placed_sell_order': False,
                 'sold': False,
-                'order_open_time': 0,
-                'tries_to_call_api': 0
+                'order_open_time': 0
             }
         else:
             self.report = report
+        self.market = trader.markets[self.report['exchange']]
+        self.quote_time = 0.0
+        self.orders = trader.orders[self.report['exchange']]
+        self.order_time = 0.0
+        self.ledger = trader.ledgers[self.report['exchange']]
+        self.markets_cache = trader.markets_caches[self.report['exchange']]
+        self.created = time.time()
+        # latency to the first order counts from when the collector got the signal, not from this task
+        self.received = self.created if received is None else received
+        self.future = None
+        self.task = None
+
+    def start(self, key):
+        self.future = asyncio.run_coroutine_threadsafe(self.run(), self.trader.loop)
+        self.future.add_done_callback(lambda future: self.trader.registry.finish(key, self))
+
+    def is_alive(self):
+        return self.future is not None and not self.future.done()
+
+    async def send(self, tokens):
+        await self.trader.loop.run_in_executor(None, self.bot.send, tokens)
+
+    async def call(self, method, *args, **kwargs):
+        start = time.time()
+        try:
+            return await self.trader.api(self.report['exchange'], method, *args, **kwargs)
+        finally:
+            self.report['work_time_secs'] += time.time() - start
 
-    def place_order(self, side, quantity, price):
-        exception = None
-        order = None
-        while True:
-            if self.report['tries_to_call_api'] > max_tries_to_call_api:
-                self.bot.send(['Number of attempts to place {0} order exceeded: {1}'.format(side, str(exception))])
-                self.report['tries_to_call_api'] = 0
-                return
-            try:
-                time.sleep(self.report['iteration_time_secs'])
-                self.report['work_time_secs'] += self.report['iteration_time_secs']
-                order = self.client.create_order(
-                    symbol=self.report['symbol'],
-                    type='limit',
-                    side=side,
-                    amount=quantity,
-                    price=price)
-            except Exception as exc:
-                exception = exc
-                self.report['tries_to_call_api'] += 1
-                continue
-            self.report['tries_to_call_api'] = 0
-            break
+    async def place_order(self, side, quantity, price):
+        try:
+            order = await self.call(
+                'create_order',
+                symbol=self.report['symbol'],
+                type='limit',
+                side=side,
+                amount=quantity,
+                price=price)
+        except Exception as exc:
+            if isinstance(exc, ccxt.InsufficientFunds):
+                self.ledger.invalidate()
+            if isinstance(exc, ccxt.NetworkError):
+                await self.send(['Unable to place {0} order, it may still have reached the exchange: {1}'.format(
+                    side, str(exc))])
+            else:
+                await self.send(['Unable to place {0} order: {1}'.format(side, str(exc))])
+            return
+        self.ledger.order_placed(order['id'], self.report['symbol'], side, quantity, price)
+        self.report['order_attempts'] = self.report.get('order_attempts', 0) + 1
         if side == 'buy':
             self.report['buy_order_id'] = order['id']
             self.report['placed_buy_order'] = True
@@ -259,25 +468,15 @@ class TraderThread(Thread):
             self.report['sell_order_id'] = order['id']
             self.report['placed_sell_order'] = True
 
-    def cancel_order(self, side):
-        exception = None
-        while True:
-            if self.report['tries_to_call_api'] > max_tries_to_call_api:
-                self.bot.send(['Number of attempts to cancel {0} order exceeded: {1}'.format(side, str(exception))])
-                self.report['tries_to_call_api'] = 0
-                return
-            try:
-                time.sleep(self.report['iteration_time_secs'])
-                self.report['work_time_secs'] += self.report['iteration_time_secs']
-                self.client.cancel_order(
-                    self.report['buy_order_id'] if side == 'buy' else self.report['sell_order_id'],
-                    self.report['symbol'])
-            except Exception as exc:
-                exception = exc
-                self.report['tries_to_call_api'] += 1
-                continue
-            self.report['tries_to_call_api'] = 0
-            break
+    async def cancel_order(self, side):
+        order_id = self.report['buy_order_id'] if side == 'buy' else self.report['sell_order_id']
+        try:
+            await self.call('cancel_order', order_id, self.report['symbol'])
+        except Exception as exc:
+            await self.send(['Unable to cancel {0} order: {1}'.format(side, str(exc))])
+            return
+        self.orders.untrack(order_id)
+        self.ledger.order_canceled(order_id)
         if side == 'buy':
             self.report['buy_order_id'] = None
             self.report['placed_buy_order'] = False
@@ -285,85 +484,93 @@ class TraderThread(Thread):
             self.report['sell_order_id'] = None
             self.report['placed_sell_order'] = False
 
-    def fetch_order(self, side):
-        exception = None
-        while True:
-            if self.report['tries_to_call_api'] > max_tries_to_call_api:
-                self.bot.send(['Number of attempts to fetch {0} order info exceeded: {1}'.format(side, str(exception))])
-                self.report['tries_to_call_api'] = 0
-                return None
-            try:
-                time.sleep(self.report['iteration_time_secs'])
-                self.report['work_time_secs'] += self.report['iteration_time_secs']
-                self.report['order_open_time'] += self.report['iteration_time_secs']
-                order_info = self.client.fetch_order(
-                    self.report['buy_order_id'] if side == 'buy' else self.report['sell_order_id'],
-                    self.report['symbol'])
-            except Exception as exc:
-                exception = exc
-                self.report['tries_to_call_api'] += 1
-                continue
-            self.report['tries_to_call_api'] = 0
-            return order_info
-
-    def fetch_balance(self, category, ticker):
-        exception = None
-        while True:
-            if self.report['tries_to_call_api'] > max_tries_to_call_api:
-                self.bot.send(['Number of attempts to fetch {0} {1} balance exceeded: {2}'.format(
-                    category,
-                    ticker,
-                    str(exception))])
-                self.report['tries_to_call_api'] = 0
-                return None
-            try:
-                time.sleep(self.report['iteration_time_secs'])
-                self.report['work_time_secs'] += self.report['iteration_time_secs']
-                balance = float(self.client.fetch_balance()[category][ticker])
-            except Exception as exc:
-                exception = exc
-                self.report['tries_to_call_api'] += 1
-                continue
-            self.report['tries_to_call_api'] = 0
-            return balance
-
-    def fetch_token(self, when):
-        exception = None
-        while True:
-            if self.report['tries_to_call_api'] > max_tries_to_call_api:
-                self.bot.send(['Number of attempts to fetch ticker info ({0}) exceeded: {1}'.format(
-                    when,
-                    str(exception))])
-                self.report['tries_to_call_api'] = 0
-                return None
-            try:
-                time.sleep(self.report['iteration_time_secs'])
-                self.report['work_time_secs'] += self.report['iteration_time_secs']
-                ticker_stats = self.client.fetch_ticker(self.report['symbol'])
-            except Exception as exc:
-                exception = exc
-                self.report['tries_to_call_api'] += 1
-                continue
-            self.report['tries_to_call_api'] = 0
-            return ticker_stats
-
-    def run(self):
+    async def fetch_order(self, side):
+        start = time.time()
+        try:
+            order_info, self.order_time = await self.orders.wait_order(
+                self.report['buy_order_id'] if side == 'buy' else self.report['sell_order_id'],
+                self.report['symbol'],
+                self.order_time)
+        except Exception as exc:
+            await self.send(['Unable to fetch {0} order info: {1}'.format(side, str(exc))])
+            return None
+        finally:
+            self.report['work_time_secs'] += time.time() - start
+            self.report['order_open_time'] += time.time() - start
+        return order_info
+
+    async def fetch_balance(self, category, ticker):
+        start = time.time()
+        try:
+            return await self.ledger.get(category, ticker)
+        except Exception as exc:
+            await self.send(['Unable to fetch {0} {1} balance: {2}'.format(category, ticker, str(exc))])
+            return None
+        finally:
+            self.report['work_time_secs'] += time.time() - start
+
+    async def fetch_book(self):
+        if not order_book_pricing or not self.client.has.get('fetchL2OrderBook'):
+            return None
+        try:
+            return await self.call('fetch_l2_order_book', self.report['symbol'], order_book_depth)
+        except Exception:
+            return None
+
+    def book_price(self, book, side, amount, fallback):
+        if book is None:
+            return fallback
+        result = price_from_book(
+            book['asks'] if side == 'buy' else book['bids'],
+            amount,
+            side,
+            order_book_tolerance,
+            in_btc=side == 'buy')
+        if result is None:
+            # an empty book or one too thin within the tolerance leaves the ticker price
+            return fallback
+        price, self.report['expected_slippage'] = result
+        return price
+
+    async def fetch_token(self, when, since=None):
+        start = time.time()
+        try:
+            ticker_stats, self.quote_time = await self.market.wait_ticker(
+                self.report['symbol'],
+                self.quote_time if since is None else max(self.quote_time, since))
+        except Exception as exc:
+            await self.send(['Unable to fetch ticker info ({0}): {1}'.format(when, str(exc))])
+            return None
+        finally:
+            self.report['work_time_secs'] += time.time() - start
+        return ticker_stats
+
+    async def run(self):
+        self.task = asyncio.current_task()
+        self.market.subscribe(self.report['symbol'])
         try:
-            with lock:
-                self.trader.locks[self.report['exchange']] = True
-
             while True:
                 self.trader.dump_thread(self.report)
 
                 if not self.report['placed_buy_order']:
-                    btc_balance = self.fetch_balance('free', 'BTC')
+                    if fast_entry:
+                        btc_balance, ticker_stats, _, book = await asyncio.gather(
+                            self.fetch_balance('free', 'BTC'),
+                            self.fetch_token('place buy', time.time() - market_poll_period),
+                            self.markets_cache.ensure(),
+                            self.fetch_book())
+                    else:
+                        btc_balance = await self.fetch_balance('free', 'BTC')
+                        ticker_stats = None
+                        book = None
                     if btc_balance is None:
                         self.report['cancel_reason'] = 'unable to fetch BTC balance before placing buy order'
                         break
 
                     needed_btc_balance = trade_amount_per_thread / float(self.report['bpi'])
 
-                    ticker_stats = self.fetch_token('place buy')
+                    if not fast_entry:
+                        ticker_stats = await self.fetch_token('place buy')
                     if ticker_stats is None:
                         self.report['cancel_reason'] = 'unable to fetch token info before placing buy order'
                         break
@@ -381,17 +588,23 @@ class TraderThread(Thread):
                     self.trader.dump_thread(self.report)
 
                     commission = exchanges_fees[self.report['exchange']] * needed_btc_balance
+                    await self.markets_cache.ensure()
+                    if not fast_entry:
+                        book = await self.fetch_book()
+                    pref_buy_price = self.book_price(book, 'buy', needed_btc_balance - commission, pref_buy_price)
                     quantity_to_buy = self.client.amount_to_precision(
                         self.report['symbol'],
                         float((needed_btc_balance - commission) / pref_buy_price))
-                    self.place_order('buy', quantity_to_buy, pref_buy_price)
+                    await self.place_order('buy', quantity_to_buy, pref_buy_price)
                     if not self.report['placed_buy_order']:
                         self.report['cancel_reason'] = 'unable to place buy order'
                         break
+                    if self.report.get('time_to_order_secs') is None:
+                        self.report['time_to_order_secs'] = time.time() - self.received
                     self.trader.dump_thread(self.report)
 
                 if self.report['placed_buy_order'] and not self.report['bought']:
-                    order_info = self.fetch_order('buy')
+                    order_info = await self.fetch_order('buy')
                     if order_info is None:
                         self.report['cancel_reason'] = 'unable to fetch order info after placing buy order'
                         break
@@ -399,30 +612,36 @@ class TraderThread(Thread):
                     if self.report['order_open_time'] > pending_order_time:
                         self.report['order_open_time'] = 0
                         if order_info['status'] == 'open':
-                            self.cancel_order('buy')
+                            await self.cancel_order('buy')
                             if self.report['placed_buy_order']:
                                 self.report['cancel_reason'] = 'unable to cancel buy order'
                                 break
                             continue
                         else:
                             self.report['bought'] = True
+                            self.orders.untrack(self.report['buy_order_id'])
+                            # fees taken in the bought coin are rarely in the order status, re-read the real balance
+                            self.ledger.invalidate()
                             self.report['buy_price'] = order_info['price']
-                            self.bot.send(['Trader:', 'Bought {0} on {1}'.format(self.report['symbol'],
+                            await self.send(['Trader:', 'Bought {0} on {1}'.format(self.report['symbol'],
                                                                                  self.report['exchange'])])
                     else:
                         if order_info['status'] == 'open':
                             continue
                         else:
                             self.report['bought'] = True
+                            self.orders.untrack(self.report['buy_order_id'])
+                            # fees taken in the bought coin are rarely in the order status, re-read the real balance
+                            self.ledger.invalidate()
                             self.report['buy_price'] = order_info['price']
                             self.report['order_open_time'] = 0
-                            self.bot.send(['Trader:', 'Bought {0} on {1}'.format(self.report['symbol'],
+                            await self.send(['Trader:', 'Bought {0} on {1}'.format(self.report['symbol'],
                                                                                  self.report['exchange'])])
 
                     self.trader.dump_thread(self.report)
 
                 if self.report['bought'] and not self.report['placed_sell_order']:
-                    ticker_stats = self.fetch_token('place sell')
+                    ticker_stats = await self.fetch_token('place sell')
                     if ticker_stats is None:
                         self.report['cancel_reason'] = 'unable to fetch token info before placing sell order'
                         break
@@ -439,19 +658,21 @@ class TraderThread(Thread):
                     else:
                         continue
 
-                    ticker_balance = self.fetch_balance('free', self.report['symbol'][:-4])
+                    ticker_balance = await self.fetch_balance('free', self.report['symbol'][:-4])
                     if ticker_balance is None:
                         self.report['cancel_reason'] = 'unable to to fetch token balance before placing sell order'
                         break
 
-                    self.place_order('sell', ticker_balance, pref_sell_price)
+                    book = await self.fetch_book()
+                    pref_sell_price = self.book_price(book, 'sell', ticker_balance, pref_sell_price)
+                    await self.place_order('sell', ticker_balance, pref_sell_price)
                     if not self.report['placed_sell_order']:
                         self.report['cancel_reason'] = 'unable to place sell order'
                         break
                     self.trader.dump_thread(self.report)
 
                 if self.report['placed_sell_order'] and not self.report['sold']:
-                    order_info = self.fetch_order('sell')
+                    order_info = await self.fetch_order('sell')
                     if order_info is None:
                         self.report['cancel_reason'] = 'unable to fetch order info after placing sell order'
                         break
@@ -459,24 +680,26 @@ class TraderThread(Thread):
                     if self.report['order_open_time'] > pending_order_time:
                         self.report['order_open_time'] = 0
                         if order_info['status'] == 'open':
-                            self.cancel_order('sell')
+                            await self.cancel_order('sell')
                             if self.report['placed_sell_order']:
                                 self.report['cancel_reason'] = 'unable to cancel sell order'
                                 break
                             continue
                         else:
                             self.report['sold'] = True
+                            self.orders.untrack(self.report['sell_order_id'])
                             self.report['sell_price'] = order_info['price']
-                            self.bot.send(['Trader:', 'Sold {0} on {1}'.format(self.report['symbol'],
+                            await self.send(['Trader:', 'Sold {0} on {1}'.format(self.report['symbol'],
                                                                                self.report['exchange'])])
                     else:
                         if order_info['status'] == 'open':
                             continue
                         else:
                             self.report['sold'] = True
+                            self.orders.untrack(self.report['sell_order_id'])
                             self.report['sell_price'] = order_info['price']
                             self.report['order_open_time'] = 0
-                            self.bot.send(['Trader:', 'Sold {0} on {1}'.format(self.report['symbol'],
+                            await self.send(['Trader:', 'Sold {0} on {1}'.format(self.report['symbol'],
                                                                                self.report['exchange'])])
 
                     self.trader.dump_thread(self.report)
@@ -487,24 +710,13 @@ class TraderThread(Thread):
 
             self.trader.dump_thread(self.report)
 
-            with lock:
-                self.trader.locks[self.report['exchange']] = False
-                self.scribe.trade(self.report)
+            self.scribe.trade(self.report)
             self.trader.remove_thread_dump(self.report)
         except Exception as exc:
-            self.bot.send(['Something wrong happened:', form_traceback(exc)])
-
+            await self.send(['Something wrong happened:', form_traceback(exc)])
+        finally:
+            self.trader.allocators[self.report['exchange']].release(self.report['symbol'][:-4])
+            self.market.unsubscribe(self.report['symbol'])
+            self.orders.untrack(self.report['buy_order_id'])
+            self.orders.untrack(self.report['sell_order_id'])
 
-class TraderThreadCleaner(Thread):
-    def __init__(self, trader, bot):
-        Thread.__init__(self)
-        self.trader = trader
-        self.bot = bot
-
-    def run(self):
-        while True:
-            time.sleep(thread_cleaning_period)
-            try:
-                self.trader.threads = [t for t in self.trader.threads if t.is_alive()]
-            except Exception as exc:
-                self.bot.send(['Something wrong happened:', form_traceback(exc)])
@@ -1,32 +1,31 @@
 import traceback
 import requests
 import json
-import time
-import gc
 
-from threading import Thread
-
-from .constants import garbage_cleaning_period
+from threading import Event
 
 
 class PoolObject:
     def __init__(self):
         self.pool = None
-        self.available = False
+        self.available_event = Event()
 
-    def set_pool(self, pool):
-        self.pool = pool
+    @property
+    def available(self):
+        return self.available_event.is_set()
 
+    @available.setter
+    def available(self, value):
+        if value:
+            self.available_event.set()
+        else:
+            self.available_event.clear()
 
-class GarbageCleanerThread(Thread):
-    def __init__(self, bot):
-        Thread.__init__(self)
-        self.bot = bot
+    def wait_available(self, timeout=None):
+        return self.available_event.wait(timeout)
 
-    def run(self):
-        while True:
-            gc.collect()
-            time.sleep(garbage_cleaning_period)
+    def set_pool(self, pool):
+        self.pool = pool
 
 
 def yobit_err(value):
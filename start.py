@@ -1,31 +1,35 @@
 import sys
 
-from src import Bot, Client, Collector, \
-    Predictor, PredictorLearnThread, Scribe, \
-    Trader, TraderThreadCleaner, GarbageCleanerThread
+from src import Bot, Client, Collector, JobManager, MemoryMonitor, \
+    Predictor, PredictorLearnThread, Profiler, Scribe, \
+    Trader
+from src.metrics import MetricsServerThread
+from src.startup import start_pool
+from src.constants import metrics_http_host, metrics_http_port
 
 if __name__ == '__main__':
     use_proxy = len(sys.argv) > 1 and sys.argv[1] == '-p'
-    pool = {
-        'client': Client(use_proxy),
-        'bot': Bot(use_proxy),
-        'collector': Collector(),
-        'predictor': Predictor(),
-        'scribe': Scribe(),
-        'trader': Trader(),
-    }
+    pool = start_pool({
+        'client': lambda: Client(use_proxy),
+        'bot': lambda: Bot(use_proxy),
+        'collector': Collector,
+        'predictor': Predictor,
+        'scribe': Scribe,
+        'trader': Trader,
+        'jobs': JobManager,
+        'profiler': Profiler,
+        'memory': MemoryMonitor,
+    })
 
-    for _, entity in pool.items():
-        entity.set_pool(pool)
+    # freeze once the model is loaded and before training builds its dataframes, those must stay collectable
+    pool['predictor'].wait_available()
+    pool['memory'].freeze()
 
-    garbage_cleaning_thread = GarbageCleanerThread(pool['bot'])
-    garbage_cleaning_thread.setDaemon(True)
-    garbage_cleaning_thread.start()
-
-    predictor_learn_thread = PredictorLearnThread(pool['predictor'], pool['client'], pool['bot'])
+    predictor_learn_thread = PredictorLearnThread(pool['predictor'], pool['client'], pool['bot'], pool['jobs'])
     predictor_learn_thread.setDaemon(True)
     predictor_learn_thread.start()
 
-    trader_thread_cleaner = TraderThreadCleaner(pool['trader'], pool['bot'])
-    trader_thread_cleaner.setDaemon(True)
-    trader_thread_cleaner.start()
+    if metrics_http_port is not None:
+        metrics_server_thread = MetricsServerThread(metrics_http_host, metrics_http_port)
+        metrics_server_thread.setDaemon(True)
+        metrics_server_thread.start()